@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from recipes.models import Recipe
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .filters import RecipesFilter
+from .paginations import KeysetPaginationLimit, PagePaginationLimit
+from .serializers import ReadRecipeSerializer
+
+ASYNC_METHODS = ('GET', )
+
+
+def run_query(func, *args, **kwargs):
+    """Выполняет синхронный код с ORM в отдельном потоке.
+
+    Потоки не привязаны к потоку запроса, поэтому независимые запросы к
+    базе можно выполнять параллельно через asyncio.gather. Соединения
+    потока закрываются по тем же правилам CONN_MAX_AGE, что и у запроса.
+    """
+    def wrapper():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type='application/json',
+    )
+
+
+def authenticate(request):
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return api_settings.UNAUTHENTICATED_USER()
+
+
+def async_read(async_view, sync_view):
+    """Обрабатывает GET асинхронной view, остальное - синхронной.
+
+    Ошибки аутентификации и NotFound из асинхронной части отдаются в том
+    же формате, что и у DRF.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method not in ASYNC_METHODS:
+            return await run_query(sync_view, request, *args, **kwargs)
+        try:
+            request.user = await run_query(authenticate, request)
+            response = await async_view(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            return json_response({'detail': error.detail}, error.status_code)
+        if response is None:
+            return await run_query(sync_view, request, *args, **kwargs)
+        return response
+    view.csrf_exempt = True
+    return view
+
+
+def threaded(sync_view):
+    """Выполняет синхронную view в пуле потоков, не блокируя event loop."""
+    async def view(request, *args, **kwargs):
+        return await run_query(sync_view, request, *args, **kwargs)
+    view.csrf_exempt = True
+    return view
+
+
+def recipe_queryset(request):
+    return Recipe.objects.with_related().with_user_flags(request.user)
+
+
+def serialize(request, instance, many=False):
+    return ReadRecipeSerializer(
+        instance, many=many, context={'request': request}
+    ).data
+
+
+async def recipe_list(request):
+    """Список рецептов: страница и COUNT(*) запрашиваются параллельно."""
+    if KeysetPaginationLimit.cursor_query_param in request.GET:
+        return None
+    filterset = RecipesFilter(
+        request.GET, queryset=recipe_queryset(request), request=request
+    )
+    if not await run_query(filterset.is_valid):
+        return json_response(filterset.errors, status.HTTP_400_BAD_REQUEST)
+    queryset = await run_query(getattr, filterset, 'qs')
+    drf_request = Request(request)
+    paginator = PagePaginationLimit()
+    bounds = paginator.get_page_bounds(drf_request)
+    if bounds is None:
+        return None
+    number, start, end = bounds
+    count, recipes = await asyncio.gather(
+        run_query(queryset.count),
+        run_query(list, queryset[start:end]),
+    )
+    recipes = paginator.paginate_page(recipes, drf_request, number, count)
+    return json_response(paginator.get_paginated_response(
+        serialize(request, recipes, many=True)
+    ).data)
+
+
+async def recipe_detail(request, pk):
+    recipes = await run_query(list, recipe_queryset(request).filter(pk=pk))
+    if not recipes:
+        raise exceptions.NotFound()
+    return json_response(serialize(request, recipes[0]))
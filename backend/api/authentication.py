@@ -0,0 +1,56 @@
+from copy import copy
+from hashlib import sha256
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import LocalLRUCache
+
+local_token_cache = LocalLRUCache()
+
+
+def token_cache_key(key):
+    return f'auth:token:{sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_token(key):
+    """Удаляет снимок токена из локального и общего кеша."""
+    cache_key = token_cache_key(key)
+    local_token_cache.delete(cache_key)
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        cache.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication со снимком токена и пользователя в кеше.
+
+    Снимок живет AUTH_TOKEN_LOCAL_TTL секунд в памяти процесса и, при
+    AUTH_TOKEN_SHARED_CACHE, AUTH_TOKEN_CACHE_TTL секунд в общем кеше
+    Django. Удаление токена и сохранение пользователя сбрасывают снимок
+    сразу; локальные копии в других процессах устаревают не дольше чем
+    на AUTH_TOKEN_LOCAL_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = local_token_cache.get(cache_key)
+        if entry is not None and entry[0] > monotonic():
+            token = entry[1]
+        else:
+            token = None
+            if settings.AUTH_TOKEN_SHARED_CACHE:
+                token = cache.get(cache_key)
+            if token is None:
+                user, token = super().authenticate_credentials(key)
+                if settings.AUTH_TOKEN_SHARED_CACHE:
+                    cache.set(
+                        cache_key, token, settings.AUTH_TOKEN_CACHE_TTL
+                    )
+            local_token_cache.set(
+                cache_key, (monotonic() + settings.AUTH_TOKEN_LOCAL_TTL, token)
+            )
+        token = copy(token)
+        token.user = copy(token.user)
+        return token.user, token
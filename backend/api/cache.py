@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from hashlib import md5
+from threading import Lock
+from time import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+CATALOG_TIMEOUT = 300
+LOCAL_CACHE_SIZE = 1024
+
+
+def catalog_version_key(catalog):
+    return f'catalog:{catalog}:version'
+
+
+def bump_catalog_version(catalog):
+    """Помечает закешированные ответы справочника устаревшими."""
+    version = time()
+    cache.set(catalog_version_key(catalog), version, CATALOG_TIMEOUT)
+    return version
+
+
+def get_catalog_version(catalog):
+    """Возвращает текущую версию справочника из общего кеша.
+
+    Версия хранится с таймаутом, поэтому даже при кеше, локальном для
+    процесса, изменения из других процессов становятся видны не позже
+    чем через CATALOG_TIMEOUT секунд.
+    """
+    key = catalog_version_key(catalog)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time(), CATALOG_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+class LocalLRUCache:
+    """LRU-кеш в памяти процесса"""
+
+    def __init__(self, size=LOCAL_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+local_catalog_cache = LocalLRUCache()
+
+
+class CachedCatalogMixin:
+    """Отдает list/retrieve справочника из кеша без обращения к базе.
+
+    Ответ сериализуется в JSON один раз на версию справочника и адрес
+    запроса, хранится в памяти процесса и в общем кеше Django и
+    сопровождается заголовками ETag и Last-Modified.
+    """
+
+    catalog = None
+    authentication_classes = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        version = get_catalog_version(self.catalog)
+        key = f'catalog:{self.catalog}:{version}:{request.get_full_path()}'
+        entry = local_catalog_cache.get(key) or cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            payload = JSONRenderer().render(response.data)
+            entry = (payload, f'"{md5(payload).hexdigest()}"')
+            cache.set(key, entry, CATALOG_TIMEOUT)
+        local_catalog_cache.set(key, entry)
+        payload, etag = entry
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(version),
+            response=HttpResponse(payload, content_type='application/json'),
+        )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(int(version))
+        return response
@@ -1,31 +1,67 @@
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredient, Recipe, Tag
 
+from .search import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                     autocomplete_ingredients)
+
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
 
+    def filter_name(self, queryset, name, value):
+        try:
+            limit = int(self.request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        return autocomplete_ingredients(queryset, value, limit)
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """Сортировка с id в конце в направлении первого поля.
+
+    Без уникального последнего поля рецепты с равными счетчиками
+    переходили бы между страницами, а курсор не мог бы их различить.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        tiebreaker = '-id' if ordering[0].startswith('-') else 'id'
+        return qs.order_by(*ordering, tiebreaker)
+
 
 class RecipesFilter(FilterSet):
+    search = filters.CharFilter(method='filter_search')
     tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = StableOrderingFilter(
+        fields=('pub_date', 'favorites_count', 'shopping_cart_count')
+    )
 
     class Meta:
         model = Recipe
         fields = (
+            'search',
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'ordering',
         )
 
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
+
     def filter_is_favorited(self, queryset, name, value):
         if value:
             return queryset.filter(favorites__user=self.request.user)
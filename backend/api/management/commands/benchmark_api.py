@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import tracemalloc
+from time import perf_counter
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscribe
+
+BASELINE = os.path.join(settings.BASE_DIR, 'data', 'benchmark_baseline.json')
+PIXEL = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAD'
+    'UlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class InProcessClient:
+    """Вызывает API через тестовый клиент Django в текущем процессе"""
+
+    measures_allocations = True
+
+    def __init__(self, token):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def request(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        body = response.json() if response.get(
+            'Content-Type', ''
+        ).startswith('application/json') and response.content else None
+        return response.status_code, body, len(queries)
+
+
+class HTTPClient:
+    """Вызывает API по HTTP, например запущенный локально gunicorn"""
+
+    measures_allocations = False
+
+    def __init__(self, token, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Token {token}'
+
+    def request(self, method, url, data=None):
+        response = self.session.request(
+            method.upper(), self.base_url + url, json=data
+        )
+        match = SERVER_TIMING_QUERIES.search(
+            response.headers.get('Server-Timing', '')
+        )
+        body = response.json() if response.headers.get(
+            'Content-Type', ''
+        ).startswith('application/json') and response.content else None
+        return (
+            response.status_code, body, int(match[1]) if match else None
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержки, число запросов к базе и выделения памяти '
+        'по эндпоинтам API и сравнивает их с базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера вместо тестового клиента.'
+        )
+        parser.add_argument('--output', help='Файл для JSON с результатами.')
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Допустимый относительный рост p50 задержки.'
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Записать результаты как новую базовую линию.'
+        )
+
+    def get_fixtures(self):
+        user = Subscribe.objects.values_list('user', flat=True).first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user
+        ).exclude(
+            shopping_cart__user=user
+        ).order_by('id').first()
+        author = Recipe.objects.exclude(author=user).values_list(
+            'author', flat=True
+        ).first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)[:8]
+        )
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if None in (user, recipe, author, ingredient) or not tags:
+            raise CommandError(
+                'Недостаточно данных: заполните базу командой seed_load.'
+            )
+        Subscribe.objects.filter(user=user, author=author).delete()
+        token, _ = Token.objects.get_or_create(user_id=user)
+        return token.key, {
+            'recipe': recipe.id,
+            'author': author,
+            'tags': tags,
+            'tag_ids': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': ingredients,
+            'prefix': ingredient[:3],
+        }
+
+    @staticmethod
+    def recipe_payload(fixtures, name):
+        return {
+            'name': name,
+            'text': 'Рецепт из нагрузочного теста.',
+            'cooking_time': 10,
+            'image': PIXEL,
+            'tags': fixtures['tag_ids'],
+            'ingredients': [
+                {'id': ingredient, 'amount': 10}
+                for ingredient in fixtures['ingredients']
+            ],
+        }
+
+    def get_scenarios(self, fixtures):
+        recipe = fixtures['recipe']
+        author = fixtures['author']
+        tags = '&'.join(f'tags={slug}' for slug in fixtures['tags'])
+        created = {}
+
+        def create():
+            return ('post', '/api/recipes/',
+                    self.recipe_payload(fixtures, 'Новый рецепт'))
+
+        def update():
+            return ('patch', f'/api/recipes/{created["id"]}/',
+                    self.recipe_payload(fixtures, 'Измененный рецепт'))
+
+        def delete():
+            return 'delete', f'/api/recipes/{created["id"]}/', None
+
+        return [
+            ('recipe-list', lambda: ('get', '/api/recipes/', None)),
+            ('recipe-list-tags',
+             lambda: ('get', f'/api/recipes/?{tags}', None)),
+            ('recipe-list-cursor',
+             lambda: ('get', '/api/recipes/?cursor=', None)),
+            ('recipe-detail',
+             lambda: ('get', f'/api/recipes/{recipe}/', None)),
+            ('recipe-create', create),
+            ('recipe-update', update),
+            ('recipe-delete', delete),
+            ('recipe-favorite-add',
+             lambda: ('post', f'/api/recipes/{recipe}/favorite/', None)),
+            ('recipe-favorite-remove',
+             lambda: ('delete', f'/api/recipes/{recipe}/favorite/', None)),
+            ('recipe-shopping-cart-add',
+             lambda: ('post', f'/api/recipes/{recipe}/shopping_cart/', None)),
+            ('recipe-shopping-cart-remove',
+             lambda: ('delete', f'/api/recipes/{recipe}/shopping_cart/',
+                      None)),
+            ('recipe-download-shopping-cart',
+             lambda: ('get', '/api/recipes/download_shopping_cart/', None)),
+            ('user-list', lambda: ('get', '/api/users/', None)),
+            ('user-me', lambda: ('get', '/api/users/me/', None)),
+            ('user-subscriptions',
+             lambda: ('get', '/api/users/subscriptions/?recipes_limit=3',
+                      None)),
+            ('user-subscribe',
+             lambda: ('post', f'/api/users/{author}/subscribe/', None)),
+            ('user-unsubscribe',
+             lambda: ('delete', f'/api/users/{author}/subscribe/', None)),
+            ('ingredient-search',
+             lambda: ('get', f'/api/ingredients/?name={fixtures["prefix"]}',
+                      None)),
+            ('tag-list', lambda: ('get', '/api/tags/', None)),
+        ], created
+
+    def run(self, client, scenarios, created, iterations, warmup):
+        """Прогоняет сценарии по кругу.
+
+        Первые warmup кругов не учитываются, следующий круг используется
+        для замера выделений памяти через tracemalloc, остальные - для
+        замера задержек без накладных расходов трассировки. Число запросов
+        берется медианное: редкие запросы при истечении кешей, например
+        токена, иначе доставались бы случайному сценарию.
+        """
+        samples = {name: [] for name, _ in scenarios}
+        queries = {name: [] for name, _ in scenarios}
+        allocations = {name: [] for name, _ in scenarios}
+        traced = warmup if client.measures_allocations else None
+        for iteration in range(warmup + iterations + 1):
+            for name, scenario in scenarios:
+                method, url, data = scenario()
+                if iteration == traced:
+                    tracemalloc.start()
+                start = perf_counter()
+                status_code, body, query_count = client.request(
+                    method, url, data
+                )
+                elapsed = (perf_counter() - start) * 1000
+                if iteration == traced:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    allocations[name].append(peak / 1024)
+                if status_code >= 400:
+                    raise CommandError(f'{name}: {method} {url} -> '
+                                       f'{status_code} {body}')
+                if name == 'recipe-create':
+                    created['id'] = body['id']
+                if iteration > warmup:
+                    samples[name].append(elapsed)
+                    queries[name].append(query_count)
+        return {
+            name: {
+                'p50_ms': round(percentile(values, 50), 3),
+                'p90_ms': round(percentile(values, 90), 3),
+                'p99_ms': round(percentile(values, 99), 3),
+                'queries': (percentile(queries[name], 50)
+                            if None not in queries[name] else None),
+                'peak_alloc_kb': (round(max(allocations[name]), 1)
+                                  if allocations[name] else None),
+            }
+            for name, values in samples.items()
+        }
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if (result['queries'] is not None
+                    and expected.get('queries') is not None
+                    and result['queries'] > expected['queries']):
+                regressions.append(
+                    f'{name}: запросов к базе {result["queries"]} '
+                    f'вместо {expected["queries"]}'
+                )
+            if result['p50_ms'] > expected['p50_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p50 {result["p50_ms"]} мс '
+                    f'вместо {expected["p50_ms"]} мс'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        token, fixtures = self.get_fixtures()
+        if options['url']:
+            client = HTTPClient(token, options['url'])
+        else:
+            client = InProcessClient(token)
+        scenarios, created = self.get_scenarios(fixtures)
+        results = self.run(
+            client, scenarios, created,
+            options['iterations'], options['warmup']
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:32} p50 {result["p50_ms"]:8.2f} мс  '
+                f'p99 {result["p99_ms"]:8.2f} мс  '
+                f'запросов {result["queries"]}  '
+                f'память {result["peak_alloc_kb"]} КБ'
+            )
+        output = options['output']
+        if options['update_baseline']:
+            output = options['baseline']
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+        if options['update_baseline']:
+            return
+        try:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write('Базовая линия не найдена, сравнение пропущено.')
+            return
+        regressions = self.compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError(
+                'Обнаружены регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
@@ -1,6 +1,169 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PagePaginationLimit(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+    def get_page_bounds(self, request):
+        """Номер страницы и границы среза для выборки без Paginator.
+
+        Нужны, когда COUNT(*) и страница запрашиваются отдельно, например
+        параллельно в асинхронной view. Для номеров вроде 'last', которым
+        нужно заранее знать число объектов, возвращает None.
+        """
+        number = request.query_params.get(self.page_query_param, 1)
+        if number in self.last_page_strings:
+            return None
+        try:
+            number = int(number)
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise NotFound(self.invalid_page_message)
+        page_size = self.get_page_size(request)
+        start = (number - 1) * page_size
+        return number, start, start + page_size
+
+    def paginate_page(self, object_list, request, number, count):
+        """Оформляет уже выбранную страницу так же, как paginate_queryset.
+
+        После вызова get_paginated_response строит ссылки и count по
+        общему числу объектов count.
+        """
+        paginator = self.django_paginator_class(
+            object_list, self.get_page_size(request)
+        )
+        paginator.count = count
+        try:
+            self.page = Page(
+                object_list, paginator.validate_number(number), paginator
+            )
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message=str(exc)
+            ))
+        self.request = request
+        return list(object_list)
+
+
+class KeysetPaginationLimit(PagePaginationLimit):
+    """Постраничная выдача с курсорным режимом по параметру cursor.
+
+    Без параметра cursor работает как PagePaginationLimit. С ним страница
+    выбирается условием по полям сортировки выборки (с id в конце для
+    уникальности) вместо OFFSET и без COUNT(*), поэтому любая страница
+    стоит столько же, сколько первая.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.decode_cursor(cursor))
+            )
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    @staticmethod
+    def get_ordering(queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
+
+    def get_keyset_filter(self, values):
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, cursor):
+        try:
+            return json.loads(urlsafe_b64decode(cursor.encode()))
+        except (DecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_cursor(values):
+        return urlsafe_b64encode(
+            json.dumps(values, default=str).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(
+                [getattr(last, field.lstrip('-')) for field in self.ordering]
+            ),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class FeedPaginationLimit(KeysetPaginationLimit):
+    """Курсорная выдача ленты по убыванию id рецепта.
+
+    Курсор есть всегда, страница собирается функцией read_ids(before,
+    limit), а рецепты загружаются одним запросом по списку id.
+    """
+
+    def paginate_feed(self, queryset, request, read_ids):
+        self.keyset = True
+        self.request = request
+        self.ordering = ['-id']
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        before = None
+        if cursor:
+            values = self.decode_cursor(cursor)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise NotFound(self.invalid_cursor_message)
+            before = values[0]
+        ids = read_ids(before, page_size + 1)
+        self.has_next = len(ids) > page_size
+        recipes = queryset.in_bulk(ids[:page_size])
+        self.page = [recipes[pk] for pk in ids[:page_size] if pk in recipes]
+        return self.page
@@ -0,0 +1,157 @@
+from itertools import chain
+from threading import Lock
+from time import time
+
+import numpy as np
+from django.core.cache import cache
+from recipes.models import IngredientAmount
+
+from .cache import CATALOG_TIMEOUT
+
+PANTRY_VERSION_KEY = 'pantry:version'
+PANTRY_MAX_PENDING = 1000
+PANTRY_MAX_MISSING = 2
+BUILD_CHUNK_SIZE = 10000
+
+
+def pantry_change_key(version):
+    return f'pantry:change:{version}'
+
+
+def get_pantry_version():
+    """Возвращает текущую версию индексов из общего кеша.
+
+    Как и версии справочников, версия хранится с таймаутом, поэтому
+    даже при кеше, локальном для процесса, индекс перестраивается с
+    изменениями из других процессов не позже чем через CATALOG_TIMEOUT
+    секунд. Новая версия начинается с отметки времени, чтобы не
+    совпадать с номерами из журнала прежней.
+    """
+    version = cache.get(PANTRY_VERSION_KEY)
+    if version is None:
+        cache.add(PANTRY_VERSION_KEY, int(time() * 1000000), CATALOG_TIMEOUT)
+        version = cache.get(PANTRY_VERSION_KEY, 0)
+    return version
+
+
+def bump_pantry_version(recipe_id=None):
+    """Сообщает индексам всех процессов об изменении состава рецепта.
+
+    Без recipe_id изменение считается неизвестным, и индексы
+    перестраиваются целиком - так делают массовые загрузки в обход
+    сигналов.
+    """
+    get_pantry_version()
+    try:
+        version = cache.incr(PANTRY_VERSION_KEY)
+    except ValueError:
+        return get_pantry_version()
+    cache.touch(PANTRY_VERSION_KEY, CATALOG_TIMEOUT)
+    if recipe_id is not None:
+        cache.set(pantry_change_key(version), recipe_id, CATALOG_TIMEOUT)
+    return version
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент -> рецепты в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов
+    (int32), для каждого рецепта - число его ингредиентов. Число
+    совпадений с набором продуктов считается одним np.bincount по
+    спискам выбранных ингредиентов, без GROUP BY в базе. Изменения
+    рецептов применяются точечно по журналу версий в общем кеше; если
+    журнал неполон, индекс строится заново.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._postings = None
+        self._sizes = None
+        self._version = None
+
+    def _build(self):
+        pairs = np.fromiter(
+            chain.from_iterable(
+                IngredientAmount.objects.order_by().values_list(
+                    'ingredient', 'recipe'
+                ).iterator(chunk_size=BUILD_CHUNK_SIZE)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        pairs = np.unique(pairs, axis=0)
+        recipes = pairs[:, 1].astype(np.int32)
+        ingredients, starts = np.unique(pairs[:, 0], return_index=True)
+        self._postings = dict(zip(
+            ingredients.tolist(), np.split(recipes, starts[1:])
+        ))
+        self._sizes = np.bincount(recipes).astype(np.int32)
+
+    def _apply(self, recipe_ids):
+        changed = np.array(sorted(recipe_ids), dtype=np.int32)
+        compositions = {}
+        for recipe, ingredient in IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('recipe', 'ingredient'):
+            compositions.setdefault(ingredient, set()).add(recipe)
+        postings = dict(self._postings)
+        for ingredient, posting in self._postings.items():
+            positions = np.searchsorted(posting, changed)
+            inside = positions < len(posting)
+            if (posting[positions[inside]] == changed[inside]).any():
+                postings[ingredient] = np.setdiff1d(
+                    posting, changed, assume_unique=True
+                )
+        for ingredient, recipes in compositions.items():
+            postings[ingredient] = np.union1d(
+                postings.get(ingredient, changed[:0]),
+                np.array(sorted(recipes), dtype=np.int32),
+            )
+        sizes = np.pad(
+            self._sizes,
+            (0, max(0, int(changed[-1]) + 1 - len(self._sizes))),
+        )
+        sizes[changed] = 0
+        for recipes in compositions.values():
+            sizes[list(recipes)] += 1
+        self._postings, self._sizes = postings, sizes
+
+    def _sync(self):
+        version = get_pantry_version()
+        with self._lock:
+            if self._version == version:
+                return
+            pending = range((self._version or 0) + 1, version + 1)
+            changes = {}
+            if (self._postings is not None and self._version < version
+                    and len(pending) <= PANTRY_MAX_PENDING):
+                changes = cache.get_many(
+                    [pantry_change_key(number) for number in pending]
+                )
+            if changes and len(changes) == len(pending):
+                self._apply(set(changes.values()))
+            else:
+                self._build()
+            self._version = version
+
+    def search(self, ingredient_ids, max_missing=PANTRY_MAX_MISSING):
+        """Возвращает рецепты, для которых не хватает <= max_missing.
+
+        Результат - массивы id рецептов и числа недостающих ингредиентов,
+        отсортированные: сначала полностью готовые к приготовлению, затем
+        по убыванию числа совпадений и от новых рецептов к старым.
+        """
+        self._sync()
+        index, sizes = self._postings, self._sizes
+        postings = [index[pk] for pk in ingredient_ids if pk in index]
+        if not postings:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        matched = np.bincount(
+            np.concatenate(postings), minlength=len(sizes)
+        )[:len(sizes)]
+        missing = sizes - matched
+        ids = np.flatnonzero((matched > 0) & (missing <= max_missing))
+        order = np.lexsort((-ids, -matched[ids], missing[ids]))
+        return ids[order], missing[ids][order]
+
+
+pantry_index = PantryIndex()
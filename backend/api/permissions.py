@@ -8,4 +8,4 @@ class IsAuthorOrReadOnly(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return (request.method in SAFE_METHODS
-                or obj.author == request.user)
+                or obj.author_id == request.user.id)
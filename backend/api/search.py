@@ -0,0 +1,88 @@
+from bisect import bisect_left
+from itertools import islice
+from threading import Lock
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+from recipes.models import Ingredient
+
+from .cache import get_catalog_version
+
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 100
+
+
+class IngredientPrefixIndex:
+    """Отсортированный по названию индекс ингредиентов в памяти процесса.
+
+    Используется для автодополнения на базах без индекса по префиксу:
+    совпадения по началу строки находятся двоичным поиском, совпадения
+    по подстроке - проходом по уже загруженному списку. Индекс
+    перестраивается при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._names = None
+        self._ids = None
+        self._version = None
+
+    def _load(self):
+        version = get_catalog_version('ingredients')
+        with self._lock:
+            if self._names is not None and self._version == version:
+                return self._names, self._ids
+            rows = sorted(Ingredient.objects.values_list('name', 'id'))
+            self._ids = [pk for _, pk in rows]
+            self._names = [name for name, _ in rows]
+            self._version = version
+            return self._names, self._ids
+
+    def search(self, value, limit):
+        names, ids = self._load()
+        start = bisect_left(names, value)
+        result = []
+        for position in range(start, len(names)):
+            if len(result) == limit or not names[position].startswith(value):
+                break
+            result.append(ids[position])
+        if len(result) < limit:
+            substring = (
+                pk for name, pk in zip(names, ids)
+                if value in name and not name.startswith(value)
+            )
+            result.extend(islice(substring, limit - len(result)))
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+def autocomplete_ingredients(queryset, value, limit):
+    """Возвращает ингредиенты: сначала по префиксу, затем по подстроке.
+
+    На PostgreSQL префиксный поиск использует индекс varchar_pattern_ops,
+    на остальных базах - индекс в памяти процесса. Порядок детерминирован:
+    внутри каждой группы совпадения сортируются по названию и id.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        ids = list(queryset.filter(
+            name__startswith=value
+        ).order_by('name', 'id').values_list('id', flat=True)[:limit])
+        if len(ids) < limit:
+            ids += queryset.filter(
+                name__contains=value
+            ).exclude(
+                name__startswith=value
+            ).order_by('name', 'id').values_list(
+                'id', flat=True
+            )[:limit - len(ids)]
+    else:
+        ids = ingredient_index.search(value, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(Case(
+        *[When(id=pk, then=Value(position))
+          for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    ))
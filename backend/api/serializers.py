@@ -1,13 +1,18 @@
 from django.db.transaction import atomic
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.images import make_variants
+from recipes.models import (Ingredient, IngredientAmount, Recipe,
+                            ShoppingListItem, Tag)
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import (ModelSerializer,
-                                        PrimaryKeyRelatedField, ReadOnlyField,
-                                        SerializerMethodField,
-                                        SlugRelatedField)
+from rest_framework.serializers import (ImageField, IntegerField, ListField,
+                                        ModelSerializer, ReadOnlyField,
+                                        Serializer, SerializerMethodField)
 from users.serializers import CustomUserSerializer
 
+from .pantry import PANTRY_MAX_MISSING
+
+PANTRY_MAX_INGREDIENTS = 100
+
 
 class TagsSerializer(ModelSerializer):
 
@@ -56,7 +61,7 @@ class IngredientsInRecipeSerializer(ModelSerializer):
 
 
 class IngredientCreateSerializer(ModelSerializer):
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IntegerField()
 
     class Meta:
         model = IngredientAmount
@@ -68,22 +73,16 @@ class IngredientCreateSerializer(ModelSerializer):
 
 class RecipeCreateSerializer(ModelSerializer):
     ingredients = IngredientCreateSerializer(many=True)
-    tags = SlugRelatedField(
-        queryset=Tag.objects.all(),
-        slug_field='id',
-        many=True
-    )
+    tags = ListField(child=IntegerField())
     image = Base64ImageField()
 
     class Meta:
         model = Recipe
         exclude = ('author', )
 
-    @staticmethod
-    def validation(data):
-        cooking_time = data['cooking_time']
-        ingredients = data['ingredients']
-        tags = data['tags']
+    def validate(self, data):
+        ingredients = data.get('ingredients')
+        tags = data.get('tags')
         if not tags:
             raise ValidationError(
                 'Должен быть хотя бы один тег.'
@@ -92,22 +91,34 @@ class RecipeCreateSerializer(ModelSerializer):
             raise ValidationError(
                 'Должен быть хотя бы один ингредиент.'
             )
-        if int(cooking_time) <= 0:
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
             raise ValidationError(
-                'Время приготовления не может быть меньше 0.'
+                'Ингредиенты не должны повторяться.'
+            )
+        if len(set(tags)) != len(tags):
+            raise ValidationError(
+                'Теги не должны повторяться.'
+            )
+        found_ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        found_tags = Tag.objects.in_bulk(tags)
+        errors = {}
+        missing = sorted(set(ingredient_ids) - found_ingredients.keys())
+        if missing:
+            errors['ingredients'] = (
+                f'Ингредиенты не найдены: {", ".join(map(str, missing))}.'
             )
-        ingredients_list = [ingredient['id'] for ingredient in ingredients]
-        for value in ingredients_list:
-            if ingredients_list.count(value) > 1:
-                raise ValidationError(
-                    'Ингредиенты не должны повторяться.'
-                )
-        tags_list = [tag for tag in tags]
-        for value in tags_list:
-            if tags_list.count(value) > 1:
-                raise ValidationError(
-                    'Теги не должны повторяться.'
-                )
+        missing = sorted(set(tags) - found_tags.keys())
+        if missing:
+            errors['tags'] = (
+                f'Теги не найдены: {", ".join(map(str, missing))}.'
+            )
+        if errors:
+            raise ValidationError(errors)
+        for ingredient in ingredients:
+            ingredient['id'] = found_ingredients[ingredient['id']]
+        data['tags'] = [found_tags[tag] for tag in tags]
+        return data
 
     def create_ingredients(self, recipe, ingredients):
         IngredientAmount.objects.bulk_create(
@@ -118,31 +129,94 @@ class RecipeCreateSerializer(ModelSerializer):
             ) for ingredient in ingredients]
         )
 
+    @staticmethod
+    def process_image(validated_data):
+        image = validated_data.get('image')
+        if image is not None:
+            validated_data.update(make_variants(Recipe, image))
+
     @atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        self.process_image(validated_data)
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        stored = set(recipe.tags.values_list('id', flat=True))
+        incoming = {tag.id for tag in tags}
+        recipe.tags.remove(*(stored - incoming))
+        recipe.tags.add(*(incoming - stored))
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Приводит ингредиенты рецепта к переданным минимальным числом строк.
+
+        Возвращает изменения количеств {id ингредиента: изменение}.
+        """
+        incoming = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        stored = {}
+        deltas = {}
+        obsolete = []
+        for item in recipe.recipe_ingredient.all():
+            deltas[item.ingredient_id] = (
+                deltas.get(item.ingredient_id, 0) - item.amount
+            )
+            if item.ingredient_id in incoming and (
+                item.ingredient_id not in stored
+            ):
+                stored[item.ingredient_id] = item
+            else:
+                obsolete.append(item.id)
+        changed = []
+        for ingredient, item in stored.items():
+            if item.amount != incoming[ingredient]:
+                item.amount = incoming[ingredient]
+                changed.append(item)
+        if obsolete:
+            IngredientAmount.objects.filter(id__in=obsolete).delete()
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ['amount'])
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe=recipe,
+                ingredient_id=ingredient,
+                amount=amount
+            ) for ingredient, amount in incoming.items()
+            if ingredient not in stored
+        ])
+        for ingredient, amount in incoming.items():
+            deltas[ingredient] = deltas.get(ingredient, 0) + amount
+        return deltas
+
     @atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        self.process_image(validated_data)
         instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(instance, ingredients)
-        instance.save
+        self.update_tags(instance, tags)
+        ShoppingListItem.objects.apply_deltas(
+            instance.shopping_cart.values_list('user', flat=True),
+            self.update_ingredients(instance, ingredients)
+        )
         return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return ReadRecipeSerializer(
             instance,
-            context={'request': self.context.get('request')}
+            context={'request': request}
         ).data
 
 
@@ -153,7 +227,8 @@ class ReadRecipeSerializer(ModelSerializer):
         source='recipe_ingredient'
     )
     tags = TagsSerializer(many=True)
-    image = Base64ImageField()
+    image = ImageField(read_only=True)
+    thumbnail = ImageField(read_only=True)
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
 
@@ -164,23 +239,55 @@ class ReadRecipeSerializer(ModelSerializer):
             'name',
             'author',
             'image',
+            'thumbnail',
             'text',
             'ingredients',
             'is_favorited',
             'is_in_shopping_cart',
             'tags',
             'cooking_time',
-            'pub_date'
+            'pub_date',
+            'favorites_count',
+            'shopping_cart_count',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_subscribed'):
+            instance.author.is_subscribed = instance.is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.shopping_cart.filter(recipe=obj).exists()
+
+
+class PantrySerializer(Serializer):
+    ingredients = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=PANTRY_MAX_INGREDIENTS,
+    )
+    max_missing = IntegerField(
+        min_value=0,
+        max_value=PANTRY_MAX_MISSING,
+        default=PANTRY_MAX_MISSING,
+    )
+
+
+class PantryRecipeSerializer(ReadRecipeSerializer):
+    missing_ingredients = IntegerField(read_only=True)
+
+    class Meta(ReadRecipeSerializer.Meta):
+        fields = ReadRecipeSerializer.Meta.fields + ('missing_ingredients', )
@@ -0,0 +1,74 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Subscribe
+
+from .authentication import invalidate_token
+from .cache import bump_catalog_version
+from .pantry import bump_pantry_version
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_catalog_version('ingredients')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_catalog_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(pre_save, sender=Recipe)
+def mark_similar_stale(instance, **kwargs):
+    if not instance._state.adding:
+        instance.similar_stale = True
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_pantry_index(instance, **kwargs):
+    transaction.on_commit(partial(bump_pantry_version, instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        get_user_model().objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(pre_delete, sender=get_user_model())
+def release_user_relations(instance, **kwargs):
+    for model in (Favorite, ShoppingCart, Subscribe):
+        model.objects.release_user(instance)
+    ShoppingListItem.objects.discard_recipes(instance.recipes.values('pk'))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(instance, **kwargs):
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
@@ -0,0 +1,56 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+@pytest.fixture(params=(False, True), ids=('local', 'shared'))
+def token_client(request, settings, user):
+    settings.AUTH_TOKEN_SHARED_CACHE = request.param
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client, token
+
+
+def get_me(client):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/users/me/')
+    return response, len(queries)
+
+
+@pytest.mark.django_db
+def test_cached_token_skips_lookup(token_client, user):
+    client, _ = token_client
+    first, uncached = get_me(client)
+    second, cached = get_me(client)
+    assert first.status_code == second.status_code == 200
+    assert second.data['id'] == user.id
+    assert cached == uncached - 1
+
+
+@pytest.mark.django_db
+def test_deleted_token_stops_authenticating(token_client):
+    client, token = token_client
+    assert get_me(client)[0].status_code == 200
+    token.delete()
+    assert get_me(client)[0].status_code == 401
+
+
+@pytest.mark.django_db
+def test_deactivated_user_stops_authenticating(token_client, user):
+    client, _ = token_client
+    assert get_me(client)[0].status_code == 200
+    user.is_active = False
+    user.save()
+    assert get_me(client)[0].status_code == 401
+
+
+@pytest.mark.django_db
+def test_saved_user_is_seen_at_once(token_client, user):
+    client, _ = token_client
+    assert get_me(client)[0].data['first_name'] == 'Имя'
+    user.first_name = 'Новое'
+    user.save()
+    assert get_me(client)[0].data['first_name'] == 'Новое'
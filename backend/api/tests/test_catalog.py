@@ -0,0 +1,35 @@
+import pytest
+from recipes.models import Tag
+
+
+@pytest.mark.django_db
+def test_catalog_is_served_from_cache(
+    api_client, tags, django_assert_num_queries
+):
+    first = api_client.get('/api/tags/')
+    assert first.status_code == 200
+    assert first['ETag'] and first['Last-Modified']
+    with django_assert_num_queries(0):
+        second = api_client.get('/api/tags/')
+    assert second.content == first.content
+    assert second['ETag'] == first['ETag']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ('/api/tags/', '/api/tags/{tag}/'))
+def test_catalog_answers_not_modified(api_client, tags, url):
+    url = url.format(tag=tags[0].id)
+    etag = api_client.get(url)['ETag']
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not response.content
+
+
+@pytest.mark.django_db
+def test_catalog_change_bumps_version(api_client, tags):
+    first = api_client.get('/api/tags/')
+    tag = Tag.objects.create(name='Новый', color='#FFFFFF', slug='new')
+    response = api_client.get('/api/tags/', HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 200
+    assert response['ETag'] != first['ETag']
+    assert tag.id in [item['id'] for item in response.json()]
@@ -0,0 +1,50 @@
+import pytest
+from api.search import AUTOCOMPLETE_LIMIT
+from recipes.models import Ingredient
+
+
+@pytest.fixture
+def pantry(db):
+    names = ('фасоль', 'соус', 'сахар', 'морская соль', 'соль')
+    return {
+        name: Ingredient.objects.create(name=name, measurement_unit='г').id
+        for name in names
+    }
+
+
+def autocomplete(client, query):
+    response = client.get(f'/api/ingredients/?{query}')
+    assert response.status_code == 200
+    return [ingredient['id'] for ingredient in response.json()]
+
+
+@pytest.mark.django_db
+def test_prefix_matches_come_before_substring_matches(api_client, pantry):
+    assert autocomplete(api_client, 'name=со') == [
+        pantry['соль'], pantry['соус'],
+        pantry['морская соль'], pantry['фасоль'],
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit, expected', (
+    ('3', 3), ('0', 1), ('abc', AUTOCOMPLETE_LIMIT),
+))
+def test_autocomplete_limit(api_client, limit, expected):
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'мука {index:02}', measurement_unit='г')
+        for index in range(AUTOCOMPLETE_LIMIT + 5)
+    ])
+    ids = autocomplete(api_client, f'name=мука&limit={limit}')
+    assert len(ids) == expected
+
+
+@pytest.mark.django_db
+def test_new_ingredient_is_found_at_once(api_client, pantry):
+    assert autocomplete(api_client, 'name=соль') == [
+        pantry['соль'], pantry['морская соль'], pantry['фасоль'],
+    ]
+    salt = Ingredient.objects.create(name='соль крупная', measurement_unit='г')
+    assert autocomplete(api_client, 'name=соль') == [
+        pantry['соль'], salt.id, pantry['морская соль'], pantry['фасоль'],
+    ]
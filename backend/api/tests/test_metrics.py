@@ -0,0 +1,115 @@
+import json
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.metrics import (RequestRecord, current_record,
+                              install_serializer_timer)
+from foodgram.middleware import AsyncRecordedStream
+from recipes.models import ShoppingCart
+from rest_framework.serializers import BaseSerializer
+
+SERVER_TIMING = re.compile(
+    r'db;dur=\d+\.\d{2};desc="(?P<queries>\d+) queries", '
+    r'serializer;dur=\d+\.\d{2}, view;dur=\d+\.\d{2}'
+)
+PROMETHEUS_SAMPLE = re.compile(
+    r'(?P<name>[a-z_]+)\{(?P<labels>[^}]*)\} (?P<value>\d+(\.\d+)?)'
+)
+
+
+@pytest.fixture
+def metrics(settings):
+    settings.PERFORMANCE_METRICS = True
+
+
+def performance_logs(caplog):
+    return [
+        json.loads(record.getMessage()) for record in caplog.records
+        if record.name == 'foodgram.performance'
+    ]
+
+
+@pytest.mark.django_db
+def test_streaming_response_queries_are_recorded(
+    metrics, api_client, user, make_recipes, caplog
+):
+    ShoppingCart.objects.link(user, [recipe.id for recipe in make_recipes(2)])
+    caplog.set_level(logging.INFO, logger='foodgram.performance')
+    response = api_client.get('/api/recipes/download_shopping_cart/')
+    assert response.streaming
+    assert 'Server-Timing' not in response
+    assert performance_logs(caplog) == []
+    assert b''.join(response.streaming_content)
+    log, = performance_logs(caplog)
+    assert log['route'] == 'recipe-download-shopping-cart'
+    assert log['queries'] == 1
+    assert log['db_ms'] > 0
+
+
+def test_async_stream_keeps_record_active():
+    record, reports = RequestRecord(), []
+
+    async def content():
+        for _ in range(2):
+            current_record.get().add_query(0.001)
+            yield b'chunk'
+
+    async def consume():
+        stream = AsyncRecordedStream(content(), record, lambda: reports.append(
+            current_record.get()
+        ))
+        return [chunk async for chunk in stream]
+
+    assert async_to_sync(consume)() == [b'chunk', b'chunk']
+    assert record.queries == 2
+    assert reports == [None]
+
+
+@pytest.mark.django_db
+def test_server_timing_reports_request_queries(
+    metrics, api_client, make_recipes
+):
+    recipe, = make_recipes(1)
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(f'/api/recipes/{recipe.id}/')
+    match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+    assert match
+    assert int(match['queries']) == len(queries)
+
+
+def test_serializer_timer_is_installed_once():
+    install_serializer_timer()
+    timed = BaseSerializer.data
+    install_serializer_timer()
+    assert BaseSerializer.data is timed
+    assert timed.fget.timed
+
+
+@pytest.mark.django_db
+def test_metrics_are_exported_to_staff_only(
+    metrics, api_client, user, make_recipes
+):
+    make_recipes(1)
+    assert api_client.get('/api/recipes/').status_code == 200
+    assert api_client.get('/api/metrics/').status_code == 403
+    user.is_staff = True
+    user.save()
+    response = api_client.get('/api/metrics/')
+    assert response.status_code == 200
+    samples = {}
+    for line in response.content.decode().splitlines():
+        if line.startswith('#'):
+            assert line.split()[:2] == ['#', 'TYPE']
+            continue
+        match = PROMETHEUS_SAMPLE.fullmatch(line)
+        assert match, line
+        samples[match['name'], match['labels']] = float(match['value'])
+    labels = 'route="recipe-list",metric="db"'
+    assert samples['foodgram_request_ms_bucket', f'{labels},le="+Inf"'] == (
+        samples['foodgram_request_ms_count', labels]
+    )
+    assert samples['foodgram_db_queries_total', 'route="recipe-list"'] > 0
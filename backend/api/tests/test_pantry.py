@@ -0,0 +1,47 @@
+import pytest
+from api.pantry import PANTRY_VERSION_KEY, bump_pantry_version, pantry_index
+from django.core.cache import cache
+
+
+@pytest.fixture
+def pantry_url(ingredients):
+    query = '&'.join(f'ingredients={item.id}' for item in ingredients[:10])
+    return f'/api/recipes/pantry/?{query}'
+
+
+@pytest.mark.django_db
+def test_pantry_skips_recipes_deleted_after_indexing(
+    api_client, make_recipes, pantry_url
+):
+    first, second = make_recipes(2)
+    response = api_client.get(pantry_url)
+    assert [item['id'] for item in response.data['results']] == [
+        first.id, second.id
+    ]
+    first.delete()
+    response = api_client.get(pantry_url)
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['results']] == [second.id]
+
+
+@pytest.mark.django_db
+def test_pantry_rebuilds_after_version_expires(
+    api_client, make_recipes, pantry_url
+):
+    first, = make_recipes(1)
+    api_client.get(pantry_url)
+    second, = make_recipes(1)
+    assert len(api_client.get(pantry_url).data['results']) == 1
+    cache.delete(PANTRY_VERSION_KEY)
+    response = api_client.get(pantry_url)
+    assert [item['id'] for item in response.data['results']] == [
+        second.id, first.id
+    ]
+
+
+@pytest.mark.django_db
+def test_bump_pantry_version_keeps_journal_sequential():
+    version = bump_pantry_version(1)
+    assert bump_pantry_version(2) == version + 1
+    pantry_index._sync()
+    assert pantry_index._version == version + 1
@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+QUERY_BUDGETS = (
+    ('/api/recipes/', 5),
+    ('/api/recipes/?tags=tag-0&tags=tag-1', 7),
+    ('/api/recipes/?cursor=', 4),
+    ('/api/recipes/{recipe}/', 4),
+    ('/api/users/subscriptions/', 3),
+    ('/api/users/subscriptions/?recipes_limit=2', 3),
+    ('/api/recipes/download_shopping_cart/', 1),
+    ('/api/recipes/download_shopping_cart/?format=csv', 1),
+)
+
+
+@pytest.fixture
+def catalog(user, author, make_user, make_recipes):
+    recipes = make_recipes(10)
+    other = make_user('other')
+    recipes += make_recipes(5, other)
+    ids = [recipe.id for recipe in recipes[::2]]
+    Subscribe.objects.link(user, [author.id, other.id])
+    Favorite.objects.link(user, ids)
+    ShoppingCart.objects.link(user, ids)
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, budget', QUERY_BUDGETS)
+def test_endpoint_query_budget(
+    api_client, catalog, django_assert_num_queries, url, budget
+):
+    url = url.format(recipe=catalog[0].id)
+    with django_assert_num_queries(budget):
+        response = api_client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_shopping_cart_queries_do_not_depend_on_amounts(
+    api_client, make_recipes
+):
+    uniform, varied = make_recipes(2)
+    for amount, item in enumerate(varied.recipe_ingredient.all(), start=1):
+        item.amount = amount
+        item.save()
+    counts = []
+    for recipe in (uniform, varied):
+        url = f'/api/recipes/{recipe.id}/shopping_cart/'
+        for method in ('post', 'delete'):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(api_client, method)(url)
+            assert response.status_code < 300
+            counts.append(len(queries))
+    assert counts[:2] == counts[2:]
+
+
+@pytest.mark.django_db
+def test_recipe_delete_query_budget(
+    api_client, user, make_recipes, django_assert_num_queries
+):
+    foreign, = make_recipes(1)
+    own, = make_recipes(1, recipe_author=user)
+    assert api_client.delete(f'/api/recipes/{foreign.id}/').status_code == 403
+    with django_assert_num_queries(12):
+        response = api_client.delete(f'/api/recipes/{own.id}/')
+    assert response.status_code == 204
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from api.async_views import async_read, recipe_list
+from api.views import RecipeViewSet
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+
+@pytest.mark.django_db
+def test_recipe_list_queries_do_not_depend_on_limit(
+    api_client, user, author, make_recipes
+):
+    recipes = make_recipes(60)
+    Favorite.objects.link(user, [recipe.id for recipe in recipes[::2]])
+    ShoppingCart.objects.link(user, [recipe.id for recipe in recipes[::3]])
+    Subscribe.objects.link(user, [author.id])
+    counts = {}
+    for limit in (6, 50):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/recipes/', {'limit': limit})
+        assert response.status_code == 200
+        assert len(response.data['results']) == limit
+        counts[limit] = len(queries)
+    assert counts[6] == counts[50]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_recipe_list_matches_sync_pages(api_client, make_recipes):
+    make_recipes(14)
+    view = async_read(recipe_list, RecipeViewSet.as_view({'get': 'list'}))
+    factory = AsyncRequestFactory()
+    for url in (
+        '/api/recipes/',
+        '/api/recipes/?page=2&limit=5',
+        '/api/recipes/?page=3&limit=5',
+    ):
+        expected = api_client.get(url)
+        response = async_to_sync(view)(factory.get(url))
+        assert response.status_code == 200
+        assert json.loads(response.content) == json.loads(expected.content)
+    response = async_to_sync(view)(factory.get('/api/recipes/?page=9'))
+    assert response.status_code == 404
@@ -0,0 +1,109 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import IngredientAmount
+
+WRITE = re.compile(r'^(INSERT|UPDATE|DELETE)(?: INTO| FROM)? "?(\w+)"?')
+
+
+def writes(queries):
+    """Возвращает пары (операция, таблица) для изменяющих запросов."""
+    return [
+        match.groups() for match in (
+            WRITE.match(query['sql']) for query in queries.captured_queries
+        ) if match
+    ]
+
+
+@pytest.fixture
+def recipe(author, make_recipes):
+    return make_recipes(1)[0]
+
+
+@pytest.fixture
+def author_client(api_client, author):
+    api_client.force_authenticate(author)
+    return api_client
+
+
+def payload(recipe, ingredients):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': list(recipe.tags.values_list('id', flat=True)),
+        'ingredients': [
+            {'id': ingredient, 'amount': amount}
+            for ingredient, amount in ingredients.items()
+        ],
+    }
+
+
+def stored_ingredients(recipe):
+    return dict(recipe.recipe_ingredient.values_list('ingredient', 'amount'))
+
+
+@pytest.mark.django_db
+def test_unchanged_patch_writes_only_recipe_row(author_client, recipe):
+    data = payload(recipe, stored_ingredients(recipe))
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.patch(
+            f'/api/recipes/{recipe.id}/', data, format='json'
+        )
+    assert response.status_code == 200
+    assert writes(queries) == [('UPDATE', 'recipes_recipe')]
+
+
+@pytest.mark.django_db
+def test_changed_ingredients_write_only_changed_rows(
+    author_client, recipe, ingredients
+):
+    stored = stored_ingredients(recipe)
+    kept = dict(recipe.recipe_ingredient.values_list('ingredient', 'id'))
+    removed, changed, *_ = stored
+    incoming = dict(stored)
+    del incoming[removed]
+    incoming[changed] += 5
+    added = next(
+        ingredient.id for ingredient in ingredients
+        if ingredient.id not in stored
+    )
+    incoming[added] = 3
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.patch(
+            f'/api/recipes/{recipe.id}/',
+            payload(recipe, incoming),
+            format='json',
+        )
+    assert response.status_code == 200
+    assert sorted(writes(queries)) == sorted([
+        ('UPDATE', 'recipes_recipe'),
+        ('DELETE', 'recipes_ingredientamount'),
+        ('UPDATE', 'recipes_ingredientamount'),
+        ('INSERT', 'recipes_ingredientamount'),
+    ])
+    assert stored_ingredients(recipe) == incoming
+    assert {
+        ingredient: pk for ingredient, pk in IngredientAmount.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient', 'id') if ingredient != added
+    } == {
+        ingredient: pk for ingredient, pk in kept.items()
+        if ingredient != removed
+    }
+
+
+@pytest.mark.django_db
+def test_unknown_ids_are_listed_comma_separated(author_client, recipe):
+    data = payload(recipe, {99998: 1, 99999: 2})
+    data['tags'] = [99999]
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', data, format='json'
+    )
+    assert response.status_code == 400
+    assert response.data['ingredients'] == [
+        'Ингредиенты не найдены: 99998, 99999.'
+    ]
+    assert response.data['tags'] == ['Теги не найдены: 99999.']
@@ -0,0 +1,97 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.relations import related_count
+from recipes.management.commands.rebuild_shopping_lists import \
+    Command as ShoppingLists
+from recipes.management.commands.reconcile_counters import COUNTERS
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe
+
+
+def drifted_counters():
+    """Счетчики, разошедшиеся с таблицами связей: {счетчик: [id]}."""
+    drifted = {}
+    for model, counter, relation, field in COUNTERS:
+        ids = list(model._base_manager.exclude(
+            **{counter: related_count(relation, field)}
+        ).values_list('pk', flat=True))
+        if ids:
+            drifted[counter] = ids
+    return drifted
+
+
+def assert_consistent():
+    assert not drifted_counters()
+    assert ShoppingLists.stored_totals() == ShoppingLists.expected_totals()
+
+
+@pytest.fixture
+def fans(make_user, user, make_recipes):
+    """Два рецепта автора в избранном и корзинах поклонников."""
+    recipes = make_recipes(2)
+    own, = make_recipes(1, recipe_author=user)
+    fans = [make_user(f'fan-{index}') for index in range(12)]
+    for fan in fans:
+        Favorite.objects.link(fan, [recipe.id for recipe in recipes])
+        ShoppingCart.objects.link(fan, [recipes[0].id])
+        Subscribe.objects.link(fan, [recipes[0].author_id])
+    Favorite.objects.link(user, [recipes[0].id, own.id])
+    ShoppingCart.objects.link(user, [recipes[0].id, own.id])
+    Subscribe.objects.link(user, [recipes[0].author_id])
+    return recipes, own, fans
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('relation', ('favorite', 'shopping_cart'))
+def test_single_add_returns_absolute_image_url(
+    api_client, make_recipes, relation
+):
+    recipe, = make_recipes(1)
+    response = api_client.post(f'/api/recipes/{recipe.id}/{relation}/')
+    assert response.status_code == 201
+    assert response.data['image'] == (
+        'http://testserver/media/recipe_img/test.png'
+    )
+
+
+@pytest.mark.django_db
+def test_recipe_delete_cascades_without_per_row_queries(
+    fans, django_assert_num_queries
+):
+    recipes, _, _ = fans
+    assert ShoppingLists.stored_totals()
+    with django_assert_num_queries(10):
+        recipes[0].delete()
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_recipe_queryset_delete_keeps_counters(fans):
+    recipes, own, _ = fans
+    Recipe.objects.filter(pk__in=[recipes[0].pk, own.pk]).delete()
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_user_delete_cascades_without_per_row_queries(
+    fans, user, django_assert_num_queries
+):
+    with django_assert_num_queries(23):
+        user.delete()
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_relation_objects_keep_counters(fans, user, author):
+    recipes, own, fans = fans
+    Favorite.objects.filter(user__in=fans[:5]).delete()
+    ShoppingCart.objects.get(user=user, recipe=own).delete()
+    Subscribe.objects.create(user=fans[0], author=user)
+    relation = Favorite.objects.create(user=author, recipe=own)
+    relation.recipe = recipes[1]
+    relation.save()
+    cart = ShoppingCart.objects.create(user=author, recipe=own)
+    cart.user = fans[1]
+    cart.save()
+    assert_consistent()
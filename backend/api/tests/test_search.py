@@ -0,0 +1,56 @@
+import pytest
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def make_recipe(author):
+    def make_recipe(name, text='Описание рецепта.'):
+        return Recipe.objects.create(
+            author=author,
+            name=name,
+            text=text,
+            cooking_time=10,
+            image='recipe_img/test.png',
+        )
+    return make_recipe
+
+
+def result_ids(response):
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_matches_above_text_matches(
+    api_client, make_recipe
+):
+    in_text = make_recipe('Каша', 'Подавать как суп.')
+    in_name = make_recipe('Грибной суп')
+    make_recipe('Салат')
+    response = api_client.get('/api/recipes/', {'search': 'суп'})
+    assert result_ids(response) == [in_name.id, in_text.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value', ('', '   '))
+def test_blank_search_is_ignored(api_client, make_recipe, value):
+    for name in ('Грибной суп', 'Каша', 'Салат'):
+        make_recipe(name)
+    expected = result_ids(api_client.get('/api/recipes/'))
+    response = api_client.get('/api/recipes/', {'search': value})
+    assert result_ids(response) == expected
+    assert len(expected) == 3
+
+
+@pytest.mark.django_db
+def test_search_cursor_walks_every_page(api_client, make_recipe):
+    in_name = [make_recipe('Томатный суп') for _ in range(5)]
+    make_recipe('Салат')
+    in_text = [make_recipe('Каша', 'Подавать как суп.') for _ in range(4)]
+    url = '/api/recipes/?search=%D1%81%D1%83%D0%BF&limit=2&cursor='
+    walked = []
+    while url:
+        response = api_client.get(url)
+        walked += result_ids(response)
+        url = response.data['next']
+    assert walked == [recipe.id for recipe in in_name + in_text]
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from .async_views import async_read, recipe_detail, recipe_list, threaded
+from .views import IngredientViewSet, MetricsView, RecipeViewSet, TagViewSet
 
 router_v1 = DefaultRouter()
 router_v1.register('recipes', RecipeViewSet)
@@ -9,5 +11,35 @@ router_v1.register('ingredients', IngredientViewSet)
 router_v1.register('tags', TagViewSet)
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router_v1.urls)),
 ]
+
+if settings.ASYNC_READ_API:
+    urlpatterns = [
+        path('recipes/', async_read(
+            recipe_list,
+            RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+        ), name='recipe-list'),
+        path('recipes/<int:pk>/', async_read(
+            recipe_detail,
+            RecipeViewSet.as_view({
+                'get': 'retrieve',
+                'put': 'update',
+                'patch': 'partial_update',
+                'delete': 'destroy',
+            })
+        ), name='recipe-detail'),
+        path('tags/', threaded(
+            TagViewSet.as_view({'get': 'list'})
+        ), name='tag-list'),
+        path('tags/<int:pk>/', threaded(
+            TagViewSet.as_view({'get': 'retrieve'})
+        ), name='tag-detail'),
+        path('ingredients/', threaded(
+            IngredientViewSet.as_view({'get': 'list'})
+        ), name='ingredient-list'),
+        path('ingredients/<int:pk>/', threaded(
+            IngredientViewSet.as_view({'get': 'retrieve'})
+        ), name='ingredient-detail'),
+    ] + urlpatterns
@@ -0,0 +1,42 @@
+import csv
+import json
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку вместо хранения"""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_txt(items):
+    for item in items:
+        yield (
+            f'{item["name"]}, {item["amount"]}, '
+            f'{item["measurement_unit"]}\n'
+        )
+
+
+def shopping_list_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for item in items:
+        yield writer.writerow(
+            (item['name'], item['amount'], item['measurement_unit'])
+        )
+
+
+def shopping_list_json(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+    'json': shopping_list_json,
+}
@@ -1,31 +1,56 @@
 from datetime import datetime
 
-from django.db.models import Sum
-from django.http import HttpResponse
+import numpy as np
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Tag)
+from foodgram.metrics import registry
+from recipes.feed import fan_out, read_feed
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.similarity import SIMILAR_TOP_K
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from users.serializers import ShortRecipeSerializer
+from rest_framework.views import APIView
+from users.serializers import RelationIdsSerializer, ShortRecipeSerializer
 
+from .cache import CachedCatalogMixin
 from .filters import IngredientFilter, RecipesFilter
-from .paginations import PagePaginationLimit
+from .paginations import (FeedPaginationLimit, KeysetPaginationLimit,
+                          PagePaginationLimit)
+from .pantry import pantry_index
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (IngredientSerializer, ReadRecipeSerializer,
+from .renderers import CSVRenderer, PlainTextRenderer
+from .serializers import (IngredientSerializer, PantryRecipeSerializer,
+                          PantrySerializer, ReadRecipeSerializer,
                           RecipeCreateSerializer, TagsSerializer)
+from .utils import SHOPPING_LIST_WRITERS
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        return HttpResponse(
+            registry.export(),
+            content_type='text/plain; version=0.0.4'
+        )
+
+
+class TagViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
+    catalog = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
+    catalog = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -38,100 +63,190 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthorOrReadOnly, )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipesFilter
-    pagination_class = PagePaginationLimit
+    pagination_class = KeysetPaginationLimit
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        if self.action == 'destroy':
+            return Recipe.objects.all()
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        fan_out(serializer.save(author=self.request.user))
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ReadRecipeSerializer
         return RecipeCreateSerializer
 
+    @action(detail=False, permission_classes=(IsAuthenticated, ))
+    def feed(self, request):
+        paginator = FeedPaginationLimit()
+        page = paginator.paginate_feed(
+            self.get_queryset(),
+            request,
+            lambda before, limit: read_feed(request.user, before, limit),
+        )
+        serializer = ReadRecipeSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def pantry(self, request):
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ids, missing = pantry_index.search(
+            set(serializer.validated_data['ingredients']),
+            serializer.validated_data['max_missing'],
+        )
+        paginator = PagePaginationLimit()
+        page = [row.tolist() for row in paginator.paginate_queryset(
+            np.column_stack((ids, missing)), request, view=self
+        )]
+        recipes = self.get_queryset().in_bulk([pk for pk, _ in page])
+        page = [(pk, count) for pk, count in page if pk in recipes]
+        for pk, count in page:
+            recipes[pk].missing_ingredients = count
+        serializer = PantryRecipeSerializer(
+            [recipes[pk] for pk, _ in page],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_TOP_K))
+        except ValueError:
+            limit = SIMILAR_TOP_K
+        limit = max(1, min(limit, SIMILAR_TOP_K))
+        recipes = list(self.get_queryset().filter(
+            similar_to__recipe=pk
+        ).order_by('-similar_to__score', '-id')[:limit])
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = ReadRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=(IsAuthenticated, ))
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if self.request.method == 'POST':
-            if Favorite.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).exists():
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not Favorite.objects.link(request.user, [recipe.pk]):
                 return Response(
                     {'errors': 'Рецепт уже в избранном.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Favorite.objects.get_or_create(user=request.user, recipe=recipe)
-            data = ShortRecipeSerializer(recipe).data
+            data = ShortRecipeSerializer(
+                recipe, context={'request': request}
+            ).data
             return Response(data, status=status.HTTP_201_CREATED)
-        if self.request.method == 'DELETE':
-            if Favorite.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).exists():
-                get_object_or_404(
-                    Favorite,
-                    user=request.user,
-                    recipe=recipe
-                ).delete()
-                return Response(
-                    'Рецепт удален из избранного.',
-                    status=status.HTTP_204_NO_CONTENT
-                )
+        if Favorite.objects.unlink(request.user, [int(pk)]):
             return Response(
-                'Данного рецепта нет в избранном.',
-                status=status.HTTP_400_BAD_REQUEST
+                'Рецепт удален из избранного.',
+                status=status.HTTP_204_NO_CONTENT
             )
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        get_object_or_404(Recipe, pk=pk)
+        return Response(
+            'Данного рецепта нет в избранном.',
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=('POST', 'DELETE'), url_path='favorite',
+            permission_classes=(IsAuthenticated, ))
+    def favorite_bulk(self, request):
+        ids = self.get_relation_ids(request)
+        if request.method == 'POST':
+            recipes = self.get_recipes(ids)
+            Favorite.objects.link(request.user, ids)
+            return self.recipes_response(recipes)
+        Favorite.objects.unlink(request.user, ids)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True,
             methods=('POST', 'DELETE'),
             permission_classes=(IsAuthenticated,)
             )
     def shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
         if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, id=pk)
             return self.add_obj(ShoppingCart, recipe, request.user)
-        return self.delete_obj(ShoppingCart, recipe, request.user)
+        return self.delete_obj(ShoppingCart, int(pk), request.user)
+
+    @action(detail=False, methods=('POST', 'DELETE'),
+            url_path='shopping_cart',
+            permission_classes=(IsAuthenticated, ))
+    def shopping_cart_bulk(self, request):
+        ids = self.get_relation_ids(request)
+        if request.method == 'POST':
+            recipes = self.get_recipes(ids)
+            ShoppingCart.objects.link(request.user, ids)
+            return self.recipes_response(recipes)
+        ShoppingCart.objects.unlink(request.user, ids)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def add_obj(self, model, recipe, user):
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        if not model.objects.link(user, [recipe.pk]):
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = ShortRecipeSerializer(recipe)
+        serializer = ShortRecipeSerializer(
+            recipe, context={'request': self.request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def delete_obj(self, model, recipe, user):
-        obj = model.objects.filter(user=user, recipe=recipe)
-        if obj.exists():
-            obj.delete()
+    def delete_obj(self, model, pk, user):
+        if model.objects.unlink(user, [pk]):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=pk)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def get_relation_ids(request):
+        serializer = RelationIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    @staticmethod
+    def get_recipes(ids):
+        recipes = Recipe.objects.in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in recipes]
+        if missing:
+            raise ValidationError(
+                {'ids': f'Рецепты не найдены: {", ".join(missing)}.'}
+            )
+        return [recipes[pk] for pk in ids]
+
+    def recipes_response(self, recipes):
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, context={'request': self.request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        shopping_cart = ShoppingCart.objects.filter(
-            user=self.request.user
-        )
-        cart_list = IngredientAmount.objects.filter(
-            recipe__in=[item.recipe.id for item in shopping_cart]
+        shopping_list = ShoppingListItem.objects.filter(
+            user=request.user
         ).values(
-            'ingredient'
-        ).annotate(
-            amount=Sum('amount')
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('name')
+        file_format = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_WRITERS[file_format](shopping_list.iterator()),
+            content_type=request.accepted_renderer.media_type,
         )
-        list_text = []
-        for item in cart_list:
-            ingredient = Ingredient.objects.get(pk=item['ingredient'])
-            amount = item['amount']
-            list_text += (
-                f'{ingredient.name}, {amount}, {ingredient.measurement_unit}\n'
-            )
-        response = HttpResponse(list_text, content_type="text/plain")
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_list.txt'
+            f'attachment; filename=shopping_list.{file_format}'
         )
         return response
@@ -0,0 +1,84 @@
+import pytest
+from django.core.cache import cache
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create(
+            username=username,
+            email=f'{username}@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('reader')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {index}', color=f'#00000{index}',
+                           slug=f'tag-{index}')
+        for index in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г'
+        )
+        for index in range(20)
+    ]
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    """Создает рецепты автора с двумя тегами и десятью ингредиентами."""
+    def make_recipes(count, recipe_author=None):
+        recipes = []
+        for index in range(count):
+            recipe = Recipe.objects.create(
+                author=recipe_author or author,
+                name=f'Рецепт {index}',
+                text='Описание рецепта.',
+                cooking_time=10,
+                image='recipe_img/test.png',
+            )
+            recipe.tags.set(tags[:2])
+            IngredientAmount.objects.bulk_create([
+                IngredientAmount(
+                    recipe=recipe, ingredient=ingredient, amount=index + 1
+                )
+                for ingredient in ingredients[index % 10:index % 10 + 10]
+            ])
+            recipes.append(recipe)
+        return recipes
+    return make_recipes
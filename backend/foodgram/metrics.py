@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from rest_framework.serializers import BaseSerializer
+
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+METRICS = ('db', 'serializer', 'view')
+
+current_record = ContextVar('current_record', default=None)
+
+
+class RequestRecord:
+    """Счетчики производительности одного запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.view = 0.0
+        self.serializer_depth = 0
+        self._lock = Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.queries += 1
+            self.db += duration
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 2),
+            'serializer_ms': round(self.serializer * 1000, 2),
+            'view_ms': round(self.view * 1000, 2),
+        }
+
+
+class Histogram:
+    """Гистограмма длительностей в миллисекундах с фиксированными корзинами"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Гистограммы метрик запросов по именам маршрутов в памяти процесса"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms = defaultdict(Histogram)
+        self._queries = defaultdict(int)
+
+    def observe(self, route, record):
+        with self._lock:
+            for metric in METRICS:
+                self._histograms[(route, metric)].observe(
+                    getattr(record, metric) * 1000
+                )
+            self._queries[route] += record.queries
+
+    def export(self):
+        """Возвращает метрики в текстовом формате Prometheus."""
+        lines = [
+            '# TYPE foodgram_request_ms histogram',
+        ]
+        with self._lock:
+            for (route, metric), histogram in sorted(
+                self._histograms.items()
+            ):
+                labels = f'route="{route}",metric="{metric}"'
+                total = 0
+                for bound, count in zip(
+                    (*BUCKETS, '+Inf'), histogram.buckets
+                ):
+                    total += count
+                    lines.append(
+                        f'foodgram_request_ms_bucket{{{labels},'
+                        f'le="{bound}"}} {total}'
+                    )
+                lines.append(
+                    f'foodgram_request_ms_sum{{{labels}}} {histogram.sum:.3f}'
+                )
+                lines.append(
+                    f'foodgram_request_ms_count{{{labels}}} {histogram.count}'
+                )
+            lines.append('# TYPE foodgram_db_queries_total counter')
+            for route, queries in sorted(self._queries.items()):
+                lines.append(
+                    f'foodgram_db_queries_total{{route="{route}"}} {queries}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record_query(execute, sql, params, many, context):
+    """Учитывает запрос в записи текущего HTTP-запроса, если она есть.
+
+    Запись берется из contextvar, поэтому запросы из потоков
+    sync_to_async асинхронных view попадают в запись своего запроса.
+    """
+    record = current_record.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.add_query(perf_counter() - start)
+
+
+def install_query_recorder(connection, **kwargs):
+    """Подключает record_query к соединению один раз за его жизнь."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_serializer_timer():
+    """Подменяет BaseSerializer.data, чтобы учитывать время сериализации.
+
+    Время считается только для внешнего вызова .data, поэтому вложенные
+    сериализаторы не учитываются дважды.
+    """
+    original = BaseSerializer.data
+    if getattr(original.fget, 'timed', False):
+        return
+
+    def data(self):
+        record = current_record.get()
+        if record is None:
+            return original.fget(self)
+        record.serializer_depth += 1
+        start = perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            record.serializer_depth -= 1
+            if not record.serializer_depth:
+                record.serializer += perf_counter() - start
+
+    timed = property(data)
+    timed.fget.timed = True
+    BaseSerializer.data = timed
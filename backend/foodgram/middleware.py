@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import (RequestRecord, current_record, install_query_recorder,
+                      install_serializer_timer, registry)
+from .routers import RoutingState, current_routing, replica_aliases
+
+logger = logging.getLogger('foodgram.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'use_primary_db'
+
+
+def start_record():
+    return current_record.set(RequestRecord())
+
+
+def report_record(request, response, record, start):
+    record.view = perf_counter() - start
+    match = request.resolver_match
+    route = match.url_name if match and match.url_name else 'unresolved'
+    registry.observe(route, record)
+    logger.info(json.dumps({
+        'route': route,
+        'method': request.method,
+        'status': response.status_code,
+        **record.as_dict(),
+    }))
+
+
+class RecordedContent:
+    """Тело потокового ответа, учитывающее запросы в записи запроса.
+
+    Запись делается текущей только на время получения очередного куска,
+    а отчет отправляется после последнего куска или при закрытии ответа.
+    """
+
+    def __init__(self, content, record, report):
+        self.content = content
+        self.record = record
+        self.report = report
+
+    def close(self):
+        if self.report is not None:
+            report, self.report = self.report, None
+            report()
+
+
+class RecordedStream(RecordedContent):
+    """Синхронное тело потокового ответа"""
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = current_record.set(self.record)
+        try:
+            return next(self.content)
+        except StopIteration:
+            pass
+        finally:
+            current_record.reset(token)
+        self.close()
+        raise StopIteration
+
+
+class AsyncRecordedStream(RecordedContent):
+    """Асинхронное тело потокового ответа"""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = current_record.set(self.record)
+        try:
+            return await self.content.__anext__()
+        except StopAsyncIteration:
+            pass
+        finally:
+            current_record.reset(token)
+        self.close()
+        raise StopAsyncIteration
+
+
+def finish_record(request, response, token, start):
+    record = current_record.get()
+    current_record.reset(token)
+    if response.streaming:
+        stream = (
+            AsyncRecordedStream if getattr(response, 'is_async', False)
+            else RecordedStream
+        )
+        response.streaming_content = stream(
+            response.streaming_content, record,
+            lambda: report_record(request, response, record, start),
+        )
+        return response
+    report_record(request, response, record, start)
+    response['Server-Timing'] = ', '.join((
+        f'db;dur={record.db * 1000:.2f};desc="{record.queries} queries"',
+        f'serializer;dur={record.serializer * 1000:.2f}',
+        f'view;dur={record.view * 1000:.2f}',
+    ))
+    return response
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    """Замеряет запросы к базе, сериализацию и время обработки view.
+
+    Результат отдается в заголовке Server-Timing, пишется в лог и
+    накапливается в гистограммах для /api/metrics/. У потоковых ответов
+    запросы выполняются при чтении тела, уже после отправки заголовков,
+    поэтому Server-Timing для них не отдается, а лог и гистограммы
+    пишутся после выдачи последнего куска. При выключенной настройке
+    PERFORMANCE_METRICS middleware не подключается. Работает и под WSGI,
+    и под ASGI без перевода запроса в синхронный режим.
+    """
+    if not settings.PERFORMANCE_METRICS:
+        raise MiddlewareNotUsed
+    install_serializer_timer()
+    connection_created.connect(install_query_recorder)
+    for connection in connections.all():
+        install_query_recorder(connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token, start = start_record(), perf_counter()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                current_record.reset(token)
+                raise
+            return finish_record(request, response, token, start)
+    else:
+        def middleware(request):
+            token, start = start_record(), perf_counter()
+            try:
+                response = get_response(request)
+            except BaseException:
+                current_record.reset(token)
+                raise
+            return finish_record(request, response, token, start)
+    return middleware
+
+
+def sticky_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.sha256(authorization.encode()).hexdigest()
+    return f'replica-sticky:{digest}'
+
+
+def start_routing(request):
+    key = sticky_key(request)
+    sticky = PRIMARY_COOKIE in request.COOKIES or (
+        key is not None and cache.get(key) is not None
+    )
+    state = RoutingState(request.method in SAFE_METHODS and not sticky)
+    return state, current_routing.set(state)
+
+
+def finish_routing(request, response, state):
+    if state.wrote or request.method not in SAFE_METHODS:
+        timeout = settings.DB_REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            PRIMARY_COOKIE, '1', max_age=timeout,
+            httponly=True, samesite='Lax',
+        )
+        key = sticky_key(request)
+        if key is not None:
+            cache.set(key, True, timeout)
+    return response
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Решает, может ли запрос читать из реплики.
+
+    Реплики используются только безопасными методами. После запроса с
+    записью клиент на DB_REPLICA_STICKY_SECONDS закрепляется за основной
+    базой, чтобы сразу видеть свои изменения несмотря на отставание
+    реплик: по cookie и по ключу в кеше для заголовка Authorization.
+    Без настроенных реплик middleware не подключается.
+    """
+    if not replica_aliases():
+        raise MiddlewareNotUsed
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = start_routing(request)
+            try:
+                response = await get_response(request)
+            finally:
+                current_routing.reset(token)
+            return finish_routing(request, response, state)
+    else:
+        def middleware(request):
+            state, token = start_routing(request)
+            try:
+                response = get_response(request)
+            finally:
+                current_routing.reset(token)
+            return finish_routing(request, response, state)
+    return middleware
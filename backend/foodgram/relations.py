@@ -0,0 +1,286 @@
+import sqlite3
+from collections import Counter, defaultdict
+
+from django.db import connections, models, router, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+RETURNING_VENDORS = ('postgresql', 'sqlite')
+
+
+def related_count(model, field):
+    """Число связанных объектов коррелированным подзапросом.
+
+    В отличие от annotate(Count(...)) не требует GROUP BY по всей
+    таблице: подзапрос выполняется только для строк, попавших в LIMIT.
+    """
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('id')
+        ).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+class CounterFieldsMixin:
+    """Не перезаписывает счетчики при сохранении объекта целиком.
+
+    Счетчики меняются UPDATE ... SET field = field + 1 в обход объектов,
+    поэтому значение в памяти может устареть, и save() без update_fields
+    затер бы чужие изменения. Поля из counter_fields записываются только
+    при создании объекта или если явно перечислены в update_fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not force_insert and not (
+            self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
+
+
+def adjust_counters(model, field, deltas):
+    """Прибавляет к счетчику field объектов model изменения deltas.
+
+    deltas - словарь {id объекта: изменение}. Объекты с одинаковым
+    изменением обновляются одним UPDATE, счетчик не опускается ниже нуля.
+    """
+    groups = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            groups[delta].append(pk)
+    for delta, ids in groups.items():
+        model._base_manager.filter(pk__in=ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def relation_target(model):
+    """Внешний ключ связи на ее объект - единственный кроме user."""
+    return next(
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.name != 'user'
+    )
+
+
+class RelationMixin:
+    """Учитывает в счетчиках связи, сохраненные или удаленные объектом.
+
+    Так связи меняет админка. При каскадном удалении пользователя или
+    рецепта эти методы не вызываются: связи удаляются одним DELETE, а
+    счетчики заранее исправляют обработчики удаления родителя.
+    """
+
+    def relation_pair(self):
+        return (
+            self.user_id,
+            getattr(self, f'{relation_target(type(self))}_id'),
+        )
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        manager = type(self)._default_manager
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            previous = None
+            if not self._state.adding:
+                previous = manager.using(using).filter(
+                    pk=self.pk
+                ).values_list('user', manager.target_field).first()
+            super().save(
+                force_insert=force_insert,
+                force_update=force_update,
+                using=using,
+                update_fields=update_fields,
+            )
+            pair = self.relation_pair()
+            if previous != pair:
+                if previous is not None:
+                    manager.changed([previous], -1)
+                manager.changed([pair], 1)
+
+    def delete(self, using=None, keep_parents=False):
+        manager = type(self)._default_manager
+        pair = self.relation_pair()
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            if deleted[0]:
+                manager.changed([pair], -1)
+        return deleted
+
+
+class RelationQuerySet(models.QuerySet):
+    def delete(self):
+        """Удаляет связи и уменьшает счетчики их объектов.
+
+        Каскадное удаление родителя этот метод не вызывает, см.
+        RelationMixin.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            pairs = list(self.values_list(
+                'user', relation_target(self.model)
+            ))
+            deleted = super().delete()
+            self.model._default_manager.changed(pairs, -1)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class RelationManager(models.Manager.from_queryset(RelationQuerySet)):
+    """Идемпотентные связи пользователя с объектом.
+
+    Используется избранным, корзиной и подписками. Добавление делается
+    одним INSERT ... ON CONFLICT DO NOTHING, удаление - одним DELETE, оба
+    возвращают id объектов, связь с которыми действительно изменилась,
+    поэтому повторный или параллельный запрос не падает на уникальном
+    ограничении и не требует предварительной проверки.
+
+    Если у модели связи задан counter_field, счетчик с этим именем у
+    объекта связи меняется в той же транзакции только на число реально
+    созданных или удаленных связей. Менеджеры отдельных связей дополняют
+    учет изменений, переопределяя changed.
+    """
+
+    @property
+    def target_field(self):
+        """Внешний ключ на объект связи - единственный кроме user."""
+        return relation_target(self.model)
+
+    @property
+    def target_model(self):
+        return self.model._meta.get_field(self.target_field).related_model
+
+    def changed(self, pairs, delta):
+        """Учитывает созданные (delta=1) или удаленные (delta=-1) связи.
+
+        pairs - пары (id пользователя, id объекта).
+        """
+        field = getattr(self.model, 'counter_field', None)
+        if field is None:
+            return
+        deltas = Counter()
+        for _, target in pairs:
+            deltas[target] += delta
+        adjust_counters(self.target_model, field, deltas)
+
+    def release_user(self, user):
+        """Уменьшает счетчики всех объектов, связанных с пользователем.
+
+        Вызывается перед удалением пользователя: его связи затем удаляются
+        каскадом одним DELETE, поэтому счетчики исправляются заранее
+        одним UPDATE, а не на каждую удаленную строку.
+        """
+        field = getattr(self.model, 'counter_field', None)
+        if field is None:
+            return
+        self.target_model._base_manager.filter(
+            pk__in=self.filter(user=user).values(self.target_field)
+        ).update(**{field: Greatest(F(field) - 1, 0)})
+
+    def _connection(self):
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor not in RETURNING_VENDORS:
+            return None
+        if (connection.vendor == 'sqlite'
+                and sqlite3.sqlite_version_info < (3, 35)):
+            return None
+        return connection
+
+    def _columns(self, connection):
+        meta = self.model._meta
+        quote = connection.ops.quote_name
+        return (
+            quote(meta.db_table),
+            quote(meta.get_field('user').column),
+            quote(meta.get_field(self.target_field).column),
+        )
+
+    def link(self, user, target_ids):
+        """Создает связи с объектами target_ids, существующие пропускает.
+
+        Возвращает id объектов, связь с которыми создана этим вызовом.
+        """
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            return []
+        connection = self._connection()
+        if connection is None:
+            existing = set(self.filter(
+                user=user, **{f'{self.target_field}__in': target_ids}
+            ).values_list(self.target_field, flat=True))
+            created = [pk for pk in target_ids if pk not in existing]
+            with transaction.atomic(
+                using=router.db_for_write(self.model), savepoint=False
+            ):
+                self.bulk_create(
+                    [self.model(user=user, **{f'{self.target_field}_id': pk})
+                     for pk in created],
+                    ignore_conflicts=True,
+                )
+                self.changed([(user.pk, pk) for pk in created], 1)
+            return created
+        table, user_column, target_column = self._columns(connection)
+        values = ', '.join(['(%s, %s)'] * len(target_ids))
+        with transaction.atomic(using=connection.alias, savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} ({user_column}, {target_column}) '
+                    f'VALUES {values} ON CONFLICT DO NOTHING '
+                    f'RETURNING {target_column}',
+                    [value for pk in target_ids for value in (user.pk, pk)],
+                )
+                created = [row[0] for row in cursor.fetchall()]
+            self.changed([(user.pk, pk) for pk in created], 1)
+        return created
+
+    def unlink(self, user, target_ids):
+        """Удаляет связи с объектами target_ids.
+
+        Возвращает id объектов, связь с которыми удалена этим вызовом.
+        """
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            return []
+        connection = self._connection()
+        if connection is None:
+            relations = self.filter(
+                user=user, **{f'{self.target_field}__in': target_ids}
+            )
+            removed = list(relations.values_list(
+                self.target_field, flat=True
+            ))
+            # Счетчики уменьшает RelationQuerySet.delete.
+            relations.delete()
+            return removed
+        table, user_column, target_column = self._columns(connection)
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with transaction.atomic(using=connection.alias, savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {user_column} = %s '
+                    f'AND {target_column} IN ({placeholders}) '
+                    f'RETURNING {target_column}',
+                    [user.pk, *target_ids],
+                )
+                removed = [row[0] for row in cursor.fetchall()]
+            self.changed([(user.pk, pk) for pk in removed], -1)
+        return removed
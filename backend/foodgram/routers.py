@@ -0,0 +1,54 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class RoutingState:
+    """Решение о маршрутизации чтения в рамках одного запроса"""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        self.replica = None
+
+    def read_alias(self):
+        if not self.use_replica or self.wrote:
+            return DEFAULT_DB_ALIAS
+        if self.replica is None:
+            self.replica = random.choice(replica_aliases())
+        return self.replica
+
+
+class ReplicaRouter:
+    """Отправляет чтение безопасных запросов на реплики.
+
+    Запись всегда идет в основную базу; после первой записи остаток
+    запроса тоже читает из основной. Вне HTTP-запроса (команды,
+    shell) используется только основная база.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is None:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
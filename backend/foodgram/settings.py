@@ -31,14 +31,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.replica_routing_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.middleware.performance_middleware',
 ]
 
+PERFORMANCE_METRICS = os.getenv('PERFORMANCE_METRICS', 'False') == 'True'
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -68,10 +72,70 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default='0')),
+    }
+}
+
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', default='').split(',')
+    if host
+]
+DB_REPLICA_NAMES = [
+    name for name in os.getenv('DB_REPLICA_NAMES', default='').split(',')
+    if name
+]
+
+for index in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': (
+            DB_REPLICA_HOSTS[index] if index < len(DB_REPLICA_HOSTS)
+            else DATABASES['default']['HOST']
+        ),
+        'NAME': (
+            DB_REPLICA_NAMES[index] if index < len(DB_REPLICA_NAMES)
+            else DATABASES['default']['NAME']
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+DB_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DB_REPLICA_STICKY_SECONDS', default='5')
+)
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default='10000'))
+
+ASYNC_READ_API = os.getenv('ASYNC_READ_API', 'False') == 'True'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
     }
 }
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -90,10 +154,16 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default='300'))
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_TTL', default='10'))
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE', 'False'
+) == 'True'
+
 DJOSER = {
     'HIDE_USERS': False,
     'SERIALIZERS': {
@@ -0,0 +1,61 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+from foodgram import middleware, routers
+from foodgram.middleware import PRIMARY_COOKIE, replica_routing_middleware
+from foodgram.routers import ReplicaRouter
+from recipes.models import Recipe
+
+AUTHORIZATION = 'Token 0123456789abcdef'
+
+
+@pytest.fixture
+def route(monkeypatch):
+    """Прогоняет запрос через middleware и возвращает базы для чтения."""
+    monkeypatch.setattr(routers, 'replica_aliases', lambda: ['replica_0'])
+    monkeypatch.setattr(middleware, 'replica_aliases', lambda: ['replica_0'])
+    router = ReplicaRouter()
+    factory = RequestFactory()
+
+    def route(method, write=False, **extra):
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(Recipe))
+            if write:
+                router.db_for_write(Recipe)
+                reads.append(router.db_for_read(Recipe))
+            return HttpResponse()
+
+        request = getattr(factory, method)('/api/recipes/', **extra)
+        response = replica_routing_middleware(view)(request)
+        return reads, response
+    return route
+
+
+def test_safe_reads_go_to_replica(route):
+    reads, response = route('get', HTTP_AUTHORIZATION=AUTHORIZATION)
+    assert reads == ['replica_0']
+    assert PRIMARY_COOKIE not in response.cookies
+
+
+def test_write_switches_rest_of_request_to_primary(route):
+    reads, response = route('get', write=True)
+    assert reads == ['replica_0', 'default']
+    assert PRIMARY_COOKIE in response.cookies
+
+
+def test_client_sticks_to_primary_after_write(route):
+    reads, response = route('post', HTTP_AUTHORIZATION=AUTHORIZATION)
+    assert reads == ['default']
+    assert response.cookies[PRIMARY_COOKIE]['max-age'] > 0
+    reads, _ = route('get', HTTP_AUTHORIZATION=AUTHORIZATION)
+    assert reads == ['default']
+    reads, _ = route('get', HTTP_COOKIE=f'{PRIMARY_COOKIE}=1')
+    assert reads == ['default']
+    reads, _ = route('get', HTTP_AUTHORIZATION='Token other')
+    assert reads == ['replica_0']
+
+
+def test_reads_outside_request_use_primary():
+    assert ReplicaRouter().db_for_read(Recipe) == 'default'
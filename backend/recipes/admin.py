@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                     ShoppingCart, Tag)
+from .models import (Favorite, FeedItem, Ingredient, IngredientAmount, Recipe,
+                     ShoppingCart, ShoppingListItem, SimilarRecipe, Tag)
 
 
 class IngredientAmountInline(admin.StackedInline):
     model = IngredientAmount
+    autocomplete_fields = ('ingredient', )
 
 
 @admin.register(Recipe)
@@ -18,17 +19,26 @@ class RecipeAdmin(admin.ModelAdmin):
         'cooking_time',
         'added_to_favorites',
     ]
-    list_editable = ['author', ]
+    list_select_related = ('author', )
+    autocomplete_fields = ('author', )
     search_fields = ['name', ]
-    list_filter = ['author', 'name', 'tags', 'pub_date']
+    list_filter = ['tags', 'pub_date']
+    show_full_result_count = False
     inlines = (IngredientAmountInline, )
     empty_value_display = 'пусто'
 
-    @admin.display(description='В избранном у:')
+    def save_related(self, request, form, formsets, change):
+        with ShoppingListItem.objects.track_recipes([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
+
+    @admin.display(
+        description='В избранном у:',
+        ordering='favorites_count',
+    )
     def added_to_favorites(self, obj):
         return (
             f'Рецепт добавлен в избранное '
-            f'{obj.favorites.count()}'
+            f'{obj.favorites_count}'
         )
 
 
@@ -37,25 +47,81 @@ class IngredientAdmin(admin.ModelAdmin):
     list_display = ['name', 'measurement_unit']
     search_fields = ['name', ]
     search_help_text = 'Поиск по названию ингредиента'
-    list_filter = ['name', ]
+    list_filter = ['measurement_unit', ]
+    show_full_result_count = False
     empty_value_display = 'пусто'
 
 
 @admin.register(IngredientAmount)
 class IngredientAmountAdmin(admin.ModelAdmin):
     list_display = ['recipe', 'ingredient', 'amount']
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    show_full_result_count = False
     empty_value_display = 'пусто'
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = [obj.recipe_id]
+        if change:
+            recipe_ids += IngredientAmount.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe', flat=True)
+        with ShoppingListItem.objects.track_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with ShoppingListItem.objects.track_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with ShoppingListItem.objects.track_recipes(
+            queryset.values_list('recipe', flat=True)
+        ):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ['user', 'recipe']
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
     empty_value_display = 'пусто'
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ['user', 'recipe']
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+    empty_value_display = 'пусто'
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    list_display = ['user', 'recipe']
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+    empty_value_display = 'пусто'
+
+
+@admin.register(SimilarRecipe)
+class SimilarRecipeAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'similar', 'score']
+    list_select_related = ('recipe', 'similar')
+    autocomplete_fields = ('recipe', 'similar')
+    show_full_result_count = False
+    empty_value_display = 'пусто'
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ingredient', 'amount']
+    list_select_related = ('user', 'ingredient')
+    autocomplete_fields = ('user', 'ingredient')
+    show_full_result_count = False
     empty_value_display = 'пусто'
 
 
@@ -0,0 +1,80 @@
+from django.conf import settings
+from users.models import Subscribe
+
+from .models import FeedItem, Recipe
+
+FEED_BATCH_SIZE = 1000
+FEED_BACKFILL_LIMIT = 50
+
+
+def add_to_feeds(pairs):
+    """Сохраняет пары (пользователь, рецепт) в ленты пачками."""
+    batch = []
+    count = 0
+    for user_id, recipe_id in pairs:
+        batch.append(FeedItem(user_id=user_id, recipe_id=recipe_id))
+        if len(batch) == FEED_BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+            batch = []
+    if batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт в ленты подписчиков автора.
+
+    Если подписчиков больше FEED_FANOUT_LIMIT, рецепт помечается для
+    сборки ленты при чтении: запись миллионов строк на каждую публикацию
+    обходится дороже, чем отдельный запрос к рецептам таких авторов.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(Subscribe.objects.filter(
+        author_id=recipe.author_id
+    ).order_by().values_list('user', flat=True)[:limit + 1])
+    if len(followers) > limit:
+        Recipe.objects.filter(pk=recipe.pk).update(feed_on_read=True)
+        return 0
+    return add_to_feeds((user_id, recipe.pk) for user_id in followers)
+
+
+def follow(user, author_ids):
+    """Добавляет в ленту последние рецепты авторов новой подписки."""
+    return add_to_feeds(
+        (user.pk, recipe_id)
+        for author_id in author_ids
+        for recipe_id in Recipe.objects.filter(
+            author_id=author_id, feed_on_read=False
+        ).order_by('-id').values_list('id', flat=True)[:FEED_BACKFILL_LIMIT]
+    )
+
+
+def unfollow(user, author_ids):
+    """Убирает из ленты рецепты авторов, от которых пользователь отписался."""
+    return FeedItem.objects.filter(
+        user=user, recipe__author__in=author_ids
+    ).delete()[0]
+
+
+def read_feed(user, before, limit):
+    """Возвращает id рецептов ленты по убыванию, меньше before.
+
+    Рецепты из сохраненной ленты объединяются с рецептами авторов,
+    лента которых собирается при чтении; обе выборки идут по индексу
+    и ограничены limit.
+    """
+    timeline = FeedItem.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        feed_on_read=True,
+        author__in=Subscribe.objects.filter(user=user).values('author'),
+    )
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    ids = set(timeline.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True
+    )[:limit])
+    ids.update(pulled.order_by('-id').values_list('id', flat=True)[:limit])
+    return sorted(ids, reverse=True)[:limit]
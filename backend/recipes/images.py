@@ -0,0 +1,49 @@
+from hashlib import sha256
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+IMAGE_VARIANTS = {
+    'image': (1280, 1280),
+    'thumbnail': (480, 480),
+}
+IMAGE_FORMAT = 'JPEG'
+IMAGE_QUALITY = 85
+
+
+def resize(image, size):
+    """Уменьшает изображение до size с сохранением пропорций в JPEG."""
+    variant = image.copy()
+    variant.thumbnail(size)
+    if variant.mode != 'RGB':
+        background = Image.new('RGB', variant.size, 'white')
+        variant = variant.convert('RGBA')
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+    buffer = BytesIO()
+    variant.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def make_variants(model, upload):
+    """Готовит варианты загруженного изображения для полей модели.
+
+    Для каждого поля из IMAGE_VARIANTS возвращает файл с именем по хешу
+    содержимого. Если такой файл уже сохранен, возвращается путь к нему,
+    и повторной записи не происходит.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image.load()
+    variants = {}
+    for field_name, size in IMAGE_VARIANTS.items():
+        content = resize(image, size)
+        name = f'{sha256(content).hexdigest()[:32]}.jpg'
+        path = model._meta.get_field(field_name).generate_filename(None, name)
+        if default_storage.exists(path):
+            variants[field_name] = path
+        else:
+            variants[field_name] = ContentFile(content, name=name)
+    return variants
@@ -0,0 +1,67 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from recipes.feed import FEED_BACKFILL_LIMIT, add_to_feeds
+from recipes.models import FeedItem, Recipe
+from users.models import Subscribe
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписчиков по существующим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-author',
+            type=int,
+            default=FEED_BACKFILL_LIMIT,
+            help='Сколько последних рецептов автора положить в ленты.'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Очистить ленты перед заполнением.'
+        )
+
+    @staticmethod
+    def followers_by_author():
+        followers = {}
+        for author_id, user_id in Subscribe.objects.order_by(
+            'author'
+        ).values_list('author', 'user').iterator():
+            followers.setdefault(author_id, []).append(user_id)
+        return followers
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        if options['clear']:
+            FeedItem.objects.all().delete()
+        heavy = list(Subscribe.objects.values('author').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_LIMIT
+        ).order_by().values_list('author', flat=True))
+        Recipe.objects.filter(feed_on_read=True).exclude(
+            author__in=heavy
+        ).update(feed_on_read=False)
+        Recipe.objects.filter(author__in=heavy).update(feed_on_read=True)
+        heavy = set(heavy)
+        count = 0
+        for author_id, user_ids in self.followers_by_author().items():
+            if author_id in heavy:
+                continue
+            recipe_ids = list(Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-id').values_list(
+                'id', flat=True
+            )[:options['per_author']])
+            count += add_to_feeds(
+                (user_id, recipe_id)
+                for user_id in user_ids for recipe_id in recipe_ids
+            )
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей ленты: {count}, авторов с лентой при чтении: '
+            f'{len(heavy)}, {elapsed:.1f} с'
+        ))
@@ -0,0 +1,146 @@
+from time import perf_counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.db.transaction import atomic
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import (METRICS, SIMILAR_MAX_DF, SIMILAR_TOP_K,
+                                RecipeMatrix)
+
+BATCH_SIZE = 1000
+FULL_REBUILD_SHARE = 0.5
+
+
+def batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по общим ингредиентам и тегам. '
+        'По умолчанию - только для измененных рецептов и тех, чьи '
+        'списки они затрагивают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать списки всех рецептов.'
+        )
+        parser.add_argument('--top-k', type=int, default=SIMILAR_TOP_K)
+        parser.add_argument('--metric', choices=METRICS, default='jaccard')
+        parser.add_argument(
+            '--max-df',
+            type=float,
+            default=SIMILAR_MAX_DF,
+            help='Не учитывать признаки, которые есть у большей доли рецептов.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать и замерить, ничего не сохранять.'
+        )
+
+    def report(self, stage, start, details=''):
+        self.stdout.write(
+            f'{stage}: {perf_counter() - start:.2f} с {details}'.rstrip()
+        )
+
+    def affected(self, matrix, stale_ids, k, metric):
+        """Рецепты, в чьих списках появляется или меняется stale_ids."""
+        affected = set()
+        for batch in batches(stale_ids):
+            affected.update(SimilarRecipe.objects.filter(
+                similar__in=batch
+            ).values_list('recipe', flat=True))
+        best = np.zeros(len(matrix.recipe_ids), dtype=np.float32)
+        positions = matrix.positions(stale_ids)
+        for start in range(0, len(positions), BATCH_SIZE):
+            scores = matrix.scores(positions[start:start + BATCH_SIZE], metric)
+            best = np.maximum(best, scores.max(axis=0).toarray().ravel())
+        best[positions] = 0
+        columns = np.flatnonzero(best)
+        candidates = dict(zip(
+            matrix.recipe_ids[columns].tolist(), best[columns].tolist()
+        ))
+        for batch in batches(candidates.keys() - affected):
+            lowest = {
+                row['recipe']: row
+                for row in SimilarRecipe.objects.filter(
+                    recipe__in=batch
+                ).values('recipe').annotate(
+                    low=Min('score'), count=Count('id')
+                ).order_by()
+            }
+            affected.update(
+                pk for pk in batch
+                if pk not in lowest or lowest[pk]['count'] < k
+                or candidates[pk] > lowest[pk]['low']
+            )
+        return affected
+
+    @staticmethod
+    def store(neighbours):
+        count = 0
+        for batch in batches(neighbours):
+            with atomic():
+                SimilarRecipe.objects.filter(recipe__in=batch).delete()
+                rows = [
+                    SimilarRecipe(recipe_id=recipe, similar_id=similar,
+                                  score=score)
+                    for recipe in batch
+                    for similar, score in neighbours[recipe]
+                ]
+                SimilarRecipe.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+                count += len(rows)
+        return count
+
+    def handle(self, *args, **options):
+        k, metric = options['top_k'], options['metric']
+        total = start = perf_counter()
+        matrix = RecipeMatrix(options['max_df'])
+        self.report('Матрица', start, (
+            f'({matrix.matrix.shape[0]} x {matrix.matrix.shape[1]}, '
+            f'{matrix.matrix.nnz} признаков)'
+        ))
+        start = perf_counter()
+        stale_ids = list(Recipe.objects.filter(
+            similar_stale=True
+        ).values_list('id', flat=True))
+        full = (
+            options['full']
+            or len(stale_ids) > FULL_REBUILD_SHARE * len(matrix.recipe_ids)
+        )
+        if full:
+            stale_ids = list(Recipe.objects.values_list('id', flat=True))
+        if not options['dry_run']:
+            for batch in batches(stale_ids):
+                Recipe.objects.filter(pk__in=batch).update(
+                    similar_stale=False
+                )
+        neighbours = {pk: [] for pk in stale_ids}
+        neighbours.update(
+            matrix.top_k(matrix.positions(stale_ids), k, metric)
+        )
+        self.report('Сходство', start, f'({len(stale_ids)} рецептов)')
+        if not full and stale_ids:
+            start = perf_counter()
+            affected = self.affected(matrix, stale_ids, k, metric)
+            neighbours.update(matrix.top_k(
+                matrix.positions(affected - neighbours.keys()), k, metric
+            ))
+            self.report('Затронутые списки', start, f'({len(affected)})')
+        if options['dry_run']:
+            self.report('Всего', total)
+            return
+        start = perf_counter()
+        count = self.store(neighbours)
+        self.report('Сохранение', start, f'({count} строк)')
+        self.report('Всего', total)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны похожие рецепты для {len(neighbours)} рецептов.'
+        ))
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+from time import perf_counter
+
+from api.cache import bump_catalog_version
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.transaction import atomic
+from recipes.models import Ingredient, Tag
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+BATCH_SIZE = 1000
+MODELS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('name', 'color', 'slug')),
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты или теги из CSV/JSON в директории data.'
+    default_model = None
+
+    def add_arguments(self, parser):
+        if self.default_model is None:
+            parser.add_argument('model', choices=MODELS.keys())
+        parser.add_argument(
+            'filename',
+            default=None,
+            nargs='?',
+            type=str
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.'
+        )
+
+    @staticmethod
+    def read_rows(file, extension, fields):
+        if extension == '.json':
+            for item in json.load(file):
+                yield tuple(item[field] for field in fields)
+            return
+        for row in csv.reader(file):
+            if len(row) != len(fields):
+                raise CommandError(f'Некорректная строка в файле: {row}')
+            yield tuple(row)
+
+    @staticmethod
+    def bulk_insert(model, fields, rows):
+        processed = 0
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                return processed
+            model.objects.bulk_create(
+                [model(**dict(zip(fields, row))) for row in batch],
+                ignore_conflicts=True,
+            )
+            processed += len(batch)
+
+    @staticmethod
+    def copy_insert(model, fields, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        processed = 0
+        for row in rows:
+            writer.writerow(row)
+            processed += 1
+        buffer.seek(0)
+        table = model._meta.db_table
+        columns = ', '.join(fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE import_buffer ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY import_buffer ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM import_buffer '
+                f'ON CONFLICT DO NOTHING'
+            )
+        return processed
+
+    def handle(self, *args, **options):
+        name = options.get('model') or self.default_model
+        model, fields = MODELS[name]
+        filename = options['filename'] or f'{name}.csv'
+        extension = os.path.splitext(filename)[1]
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        start = perf_counter()
+        try:
+            with open(os.path.join(DATA_ROOT, filename), 'r',
+                      encoding='utf-8') as file, atomic():
+                existing = model.objects.count()
+                rows = self.read_rows(file, extension, fields)
+                if use_copy:
+                    processed = self.copy_insert(model, fields, rows)
+                else:
+                    processed = self.bulk_insert(model, fields, rows)
+                inserted = model.objects.count() - existing
+        except FileNotFoundError:
+            raise CommandError(f'Файл {filename} не найден в директории.')
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Ошибка чтения файла {filename}: {error}')
+        elapsed = perf_counter() - start
+        bump_catalog_version(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.verbose_name_plural}: обработано {processed}, '
+            f'добавлено {inserted} за {elapsed:.3f} с '
+            f'({processed / elapsed if elapsed else 0:.0f} строк/с)'
+        ))
@@ -1,33 +1,6 @@
-import csv
-import os
+from .import_data import Command as ImportCommand
 
-from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
-from recipes.models import Ingredient
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
-
-
-class Command(BaseCommand):
-
-    def add_arguments(self, parser):
-        parser.add_argument(
-            'filename',
-            default='ingredients.csv',
-            nargs='?',
-            type=str
-        )
-
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as file:
-                data = csv.reader(file)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-        except FileNotFoundError:
-            raise CommandError('Файл с ингредиентами не найден в директории.')
+class Command(ImportCommand):
+    help = 'Загружает ингредиенты из директории data.'
+    default_model = 'ingredients'
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Sum
+from django.db.transaction import atomic
+from recipes.models import IngredientAmount, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает и проверяет суммарные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить сохраненные суммы с корзинами.'
+        )
+
+    @staticmethod
+    def expected_totals():
+        return {
+            (row['user'], row['ingredient']): row['total']
+            for row in IngredientAmount.objects.filter(
+                recipe__shopping_cart__isnull=False
+            ).values(
+                'ingredient',
+                user=F('recipe__shopping_cart__user'),
+            ).annotate(
+                total=Sum('amount')
+            ).order_by()
+        }
+
+    @staticmethod
+    def stored_totals():
+        return {
+            (user, ingredient): amount
+            for user, ingredient, amount
+            in ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount'
+            )
+        }
+
+    def handle(self, *args, **options):
+        expected = self.expected_totals()
+        stored = self.stored_totals()
+        drift = {
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+        self.stdout.write(
+            f'Позиций в списках: {len(expected)}, расхождений: {len(drift)}'
+        )
+        if options['check']:
+            if drift:
+                raise CommandError('Списки покупок не совпадают с корзинами.')
+            return
+        with atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                [ShoppingListItem(
+                    user_id=user,
+                    ingredient_id=ingredient,
+                    amount=amount
+                ) for (user, ingredient), amount in expected.items()],
+                batch_size=BATCH_SIZE,
+            )
+        if self.stored_totals() != expected:
+            raise CommandError('Не удалось пересчитать списки покупок.')
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны.'))
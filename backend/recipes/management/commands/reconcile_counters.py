@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from foodgram.relations import related_count
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного, корзин, подписчиков и рецептов '
+        'с таблицами связей и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать число расхождений, ничего не менять.'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, counter, relation, field in COUNTERS:
+            drifted = model._base_manager.exclude(
+                **{counter: related_count(relation, field)}
+            )
+            if options['dry_run']:
+                count = drifted.count()
+            else:
+                count = drifted.update(
+                    **{counter: related_count(relation, field)}
+                )
+            total += count
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}, '
+                f'{model._meta.get_field(counter).verbose_name}: '
+                f'расхождений {count}'
+            )
+        message = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(
+            self.style.SUCCESS(f'{message} расхождений: {total}')
+        )
@@ -0,0 +1,206 @@
+import random
+from bisect import bisect_left
+from itertools import accumulate, islice
+from time import perf_counter
+
+from api.pantry import bump_pantry_version
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+SEED_IMAGE = 'recipe_img/seed.jpg'
+
+
+class ZipfSampler:
+    """Выбирает элементы последовательности с вероятностью ~ 1 / rank^s"""
+
+    def __init__(self, items, rng, exponent=ZIPF_EXPONENT):
+        self.items = items
+        self.rng = rng
+        self.weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(items) + 1)
+        ))
+
+    def __call__(self):
+        point = self.rng.random() * self.weights[-1]
+        return self.items[bisect_left(self.weights, point)]
+
+    def sample(self, count):
+        """Возвращает count различных элементов."""
+        count = min(count, len(self.items))
+        chosen = set()
+        for _ in range(count * 20):
+            if len(chosen) == count:
+                return chosen
+            chosen.add(self())
+        rest = [item for item in self.items if item not in chosen]
+        chosen.update(self.rng.sample(rest, count - len(chosen)))
+        return chosen
+
+
+class Command(BaseCommand):
+    help = 'Генерирует детерминированный набор данных для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Максимум избранных рецептов у пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Максимум рецептов в корзине пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Максимум подписок у пользователя.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками, не держа весь набор в памяти."""
+        total = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return total
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+
+    @staticmethod
+    def next_id(model):
+        return (model.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+
+    def report(self, name, count, start):
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f'{name}: {count} за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else 0:.0f} строк/с)'
+        )
+
+    def generate_users(self, count):
+        first_id = self.next_id(User)
+        password = make_password(None)
+        for number in range(first_id, first_id + count):
+            yield User(
+                id=number,
+                username=f'load_{number}',
+                email=f'load_{number}@example.com',
+                first_name='Нагрузка',
+                last_name=str(number),
+                password=password,
+            )
+
+    def generate_recipes(self, count, authors):
+        first_id = self.next_id(Recipe)
+        for number in range(first_id, first_id + count):
+            yield Recipe(
+                id=number,
+                author_id=authors(),
+                name=f'Рецепт {number}',
+                text='Сгенерированный рецепт для нагрузочного теста.',
+                image=SEED_IMAGE,
+                cooking_time=self.rng.randint(5, 240),
+            )
+
+    def generate_amounts(self, recipe_ids, ingredients):
+        for recipe in recipe_ids:
+            for ingredient in sorted(
+                ingredients.sample(self.rng.randint(3, 15))
+            ):
+                yield IngredientAmount(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=self.rng.randint(1, 500),
+                )
+
+    def generate_tags(self, recipe_ids, tags):
+        through = Recipe.tags.through
+        for recipe in recipe_ids:
+            for tag in sorted(tags.sample(self.rng.randint(1, 3))):
+                yield through(recipe_id=recipe, tag_id=tag)
+
+    def generate_relations(self, model, field, user_ids, targets, limit):
+        for user in user_ids:
+            chosen = targets.sample(self.rng.randint(0, limit))
+            for target in sorted(chosen - {user} if field == 'author'
+                                 else chosen):
+                yield model(user_id=user, **{f'{field}_id': target})
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        if not Tag.objects.exists():
+            call_command('load_tags', stdout=self.stdout)
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError('Нет ингредиентов или тегов для генерации.')
+        self.rng.shuffle(ingredient_ids)
+        ingredients = ZipfSampler(ingredient_ids, self.rng)
+        tags = ZipfSampler(tag_ids, self.rng)
+
+        start = perf_counter()
+        first_user = self.next_id(User)
+        count = self.insert(User, self.generate_users(options['users']))
+        self.report('Пользователи', count, start)
+        user_ids = list(range(first_user, first_user + count))
+        if not user_ids:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        authors = ZipfSampler(user_ids, self.rng)
+
+        start = perf_counter()
+        first_recipe = self.next_id(Recipe)
+        count = self.insert(
+            Recipe, self.generate_recipes(options['recipes'], authors)
+        )
+        self.report('Рецепты', count, start)
+        recipe_ids = range(first_recipe, first_recipe + count)
+
+        start = perf_counter()
+        count = self.insert(
+            IngredientAmount, self.generate_amounts(recipe_ids, ingredients)
+        )
+        self.report('Ингредиенты рецептов', count, start)
+        start = perf_counter()
+        count = self.insert(
+            Recipe.tags.through, self.generate_tags(recipe_ids, tags)
+        )
+        self.report('Теги рецептов', count, start)
+
+        if recipe_ids:
+            recipes = ZipfSampler(recipe_ids, self.rng)
+            for model, field, targets, limit in (
+                (Favorite, 'recipe', recipes, options['favorites']),
+                (ShoppingCart, 'recipe', recipes, options['carts']),
+                (Subscribe, 'author', authors, options['subscriptions']),
+            ):
+                start = perf_counter()
+                count = self.insert(model, self.generate_relations(
+                    model, field, user_ids, targets, limit
+                ))
+                self.report(model._meta.verbose_name_plural, count, start)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Recipe]
+            ):
+                cursor.execute(sql)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('backfill_feed', stdout=self.stdout)
+        bump_pantry_version()
+        call_command('build_similar_recipes', stdout=self.stdout)
@@ -1,9 +1,24 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.core.exceptions import EmptyResultSet
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connection, models, router, transaction
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Q, Subquery,
+                              Sum, Value, When, Window)
+from django.db.models.functions import Coalesce, Greatest, RowNumber
+from foodgram.relations import (CounterFieldsMixin, RelationManager,
+                                RelationMixin, adjust_counters)
+from users.models import Subscribe
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+
 
 class Tag(models.Model):
     """Класс модели тегов"""
@@ -60,12 +75,154 @@ class Ingredient(models.Model):
             fields=['name', 'measurement_unit'],
             name='unique_measurement'
         )]
+        indexes = [models.Index(
+            fields=['name'],
+            name='ingredient_name_prefix',
+            opclasses=['varchar_pattern_ops'],
+        )]
 
     def __str__(self) -> str:
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов с признаками текущего пользователя"""
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты признаками избранного, корзины и подписки.
+
+        Флаги вычисляются подзапросами в том же SELECT, поэтому их
+        получение не зависит от количества рецептов на странице.
+        """
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                is_subscribed=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def limit_per_author(self, limit):
+        """Оставляет не более limit первых рецептов каждого автора.
+
+        Нумерация рецептов внутри автора делается оконной функцией
+        ROW_NUMBER, поэтому выборка для любого числа авторов - один запрос.
+        """
+        queryset = self.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F(field).asc() for field in self.model._meta.ordering],
+        ))
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            f'WHERE ranked.row_number <= %s '
+            f'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit),
+        )
+
+    @staticmethod
+    def release(recipes):
+        """Исправляет счетчики перед удалением рецептов.
+
+        recipes - пары (id рецепта, id автора). Рецепты убираются из
+        списков покупок всех, у кого они в корзине, а счетчики рецептов
+        авторов уменьшаются одним UPDATE на все рецепты, а не обработчиком
+        на каждый удаленный рецепт. При каскадном удалении автора метод
+        не вызывается, списки покупок исправляет обработчик pre_delete
+        пользователя.
+        """
+        ShoppingListItem.objects.discard_recipes(
+            [recipe for recipe, _ in recipes]
+        )
+        authors = Counter(author for _, author in recipes)
+        adjust_counters(User, 'recipes_count', {
+            author: -count for author, count in authors.items()
+        })
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.release(list(self.values_list('pk', 'author')))
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты для сериализации.
+
+        Автор присоединяется через JOIN, теги и ингредиенты загружаются
+        отдельным запросом на всю выборку, а не на каждый рецепт.
+        Поисковый вектор для выдачи не нужен и не выбирается.
+        """
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredient',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def update_search_vector(self):
+        """Пересчитывает сохраненный поисковый вектор рецептов.
+
+        Название весит больше текста. Вне PostgreSQL вектор не хранится.
+        """
+        if connection.vendor != 'postgresql':
+            return 0
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        ))
+
+    def search(self, value):
+        """Оставляет рецепты, подходящие под запрос, по убыванию релевантности.
+
+        В PostgreSQL запрос ищется по индексированному поисковому вектору
+        с учетом морфологии. В остальных базах каждое слово ищется
+        подстрокой в названии или тексте, совпадение в названии весит
+        больше.
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            queryset = self.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            )
+        else:
+            words = value.split()
+            condition = Q()
+            rank = Value(0.0)
+            for word in words:
+                condition &= Q(name__icontains=word) | Q(text__icontains=word)
+                rank = rank + Case(
+                    When(name__icontains=word, then=Value(1.0)),
+                    default=Value(0.5),
+                    output_field=models.FloatField(),
+                )
+            queryset = self.filter(condition).annotate(search_rank=rank)
+        return queryset.order_by('-search_rank', 'id')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Класс модели рецептов"""
 
     author = models.ForeignKey(
@@ -85,6 +242,11 @@ class Recipe(models.Model):
         verbose_name='Фотография блюда',
         help_text='Добавьте фотографию блюда',
     )
+    thumbnail = models.ImageField(
+        upload_to='recipe_img/thumbnails/',
+        blank=True,
+        verbose_name='Миниатюра блюда',
+    )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Теги',
@@ -113,15 +275,78 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    feed_on_read = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лента собирается при чтении',
+    )
+    similar_stale = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Похожие рецепты устарели',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
-        ordering = ['pub_date']
+        ordering = ['pub_date', 'id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='recipe_pub_date_id',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector',
+            ),
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_feed_on_read',
+                condition=Q(feed_on_read=True),
+            ),
+            models.Index(
+                fields=['id'],
+                name='recipe_similar_stale',
+                condition=Q(similar_stale=True),
+            ),
+            models.Index(
+                fields=['favorites_count', 'id'],
+                name='recipe_favorites_count_id',
+            ),
+            models.Index(
+                fields=['shopping_cart_count', 'id'],
+                name='recipe_shopping_cart_count_id',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(Recipe, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            Recipe.objects.release([(self.pk, self.author_id)])
+            return super().delete(using=using, keep_parents=keep_parents)
+
 
 class IngredientAmount(models.Model):
     """Класс модели списка ингредиентов"""
@@ -157,7 +382,7 @@ class IngredientAmount(models.Model):
         return self.ingredient.name
 
 
-class Favorite(models.Model):
+class Favorite(RelationMixin, models.Model):
     """Класс модели подписок(избранного)"""
 
     user = models.ForeignKey(
@@ -175,6 +400,10 @@ class Favorite(models.Model):
         help_text='Выберите рецепт',
     )
 
+    objects = RelationManager()
+
+    counter_field = 'favorites_count'
+
     class Meta:
         ordering = ('id', )
         verbose_name = 'Избранное'
@@ -191,7 +420,22 @@ class Favorite(models.Model):
         )
 
 
-class ShoppingCart(models.Model):
+class ShoppingCartManager(RelationManager):
+    """Связи с корзиной, меняющие вместе со счетчиками списки покупок"""
+
+    def changed(self, pairs, delta):
+        super().changed(pairs, delta)
+        recipes = defaultdict(list)
+        for user, recipe in pairs:
+            recipes[user].append(recipe)
+        for user, recipe_ids in recipes.items():
+            if delta > 0:
+                ShoppingListItem.objects.add_recipes([user], recipe_ids)
+            else:
+                ShoppingListItem.objects.remove_recipes([user], recipe_ids)
+
+
+class ShoppingCart(RelationMixin, models.Model):
     """Класс модели корзины"""
 
     user = models.ForeignKey(
@@ -207,6 +451,10 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = ShoppingCartManager()
+
+    counter_field = 'shopping_cart_count'
+
     class Meta:
         ordering = ('id', )
         verbose_name = 'Корзину'
@@ -221,3 +469,223 @@ class ShoppingCart(models.Model):
         return (
             f'Рецепт {self.recipe} в корзине пользователя {self.user}'
         )
+
+
+class FeedItem(models.Model):
+    """Класс модели ленты рецептов от авторов из подписок"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        ordering = ('-recipe_id', )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_item'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Рецепт {self.recipe} в ленте пользователя {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Класс модели заранее посчитанных похожих рецептов"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similar_recipe'
+            )
+        ]
+        indexes = [models.Index(
+            fields=['recipe', '-score'],
+            name='similar_recipe_score',
+        )]
+
+    def __str__(self) -> str:
+        return f'Рецепт {self.similar} похож на {self.recipe}'
+
+
+class ShoppingListManager(models.Manager):
+    """Менеджер, поддерживающий суммы списка покупок в актуальном виде"""
+
+    @staticmethod
+    def amounts_by_recipe(recipe_ids):
+        """Возвращает {id рецепта: {id ингредиента: количество}}."""
+        amounts = {pk: {} for pk in recipe_ids}
+        for recipe, ingredient, total in IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).values('recipe', 'ingredient').annotate(
+            total=Sum('amount')
+        ).order_by().values_list('recipe', 'ingredient', 'total'):
+            amounts[recipe][ingredient] = total
+        return amounts
+
+    @staticmethod
+    def recipe_amounts(recipe_ids):
+        """Возвращает словарь {id ингредиента: количество} для рецептов."""
+        return dict(
+            IngredientAmount.objects.filter(recipe__in=recipe_ids).values(
+                'ingredient'
+            ).annotate(
+                total=Sum('amount')
+            ).order_by().values_list('ingredient', 'total')
+        )
+
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавляет изменения количеств ингредиентов к спискам покупок.
+
+        deltas - словарь {id ингредиента: изменение количества}, user_ids -
+        пользователи, чьи списки нужно изменить. Все ингредиенты
+        обновляются одним UPDATE с CASE по ингредиенту, строки с нулевой
+        суммой удаляются.
+        """
+        deltas = {
+            ingredient: delta for ingredient, delta in deltas.items() if delta
+        }
+        if not deltas:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, ingredient_id=ingredient, amount=0)
+             for user_id in user_ids
+             for ingredient, delta in deltas.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        self.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=deltas,
+        ).update(amount=Greatest(F('amount') + Case(
+            *[When(ingredient_id=ingredient, then=Value(delta))
+              for ingredient, delta in deltas.items()],
+            output_field=models.IntegerField(),
+        ), 0))
+        self.filter(user_id__in=user_ids, amount=0).delete()
+
+    def discard_recipes(self, recipe_ids):
+        """Убирает рецепты из списков покупок всех, у кого они в корзине.
+
+        Вызывается перед удалением рецептов, пока строки корзины еще
+        существуют. Количество каждой позиции уменьшается коррелированным
+        подзапросом, поэтому запросов два при любом числе рецептов и
+        пользователей.
+        """
+        users = ShoppingCart.objects.filter(
+            recipe__in=recipe_ids
+        ).values('user')
+        removed = IngredientAmount.objects.filter(
+            recipe__in=recipe_ids,
+            recipe__shopping_cart__user=OuterRef('user'),
+            ingredient=OuterRef('ingredient'),
+        ).order_by().values('ingredient').annotate(
+            total=Sum('amount')
+        ).values('total')
+        self.filter(user__in=users).update(amount=Greatest(
+            F('amount') - Coalesce(Subquery(removed), 0), 0
+        ))
+        self.filter(user__in=users, amount=0).delete()
+
+    @contextmanager
+    def track_recipes(self, recipe_ids):
+        """Переносит в списки покупок изменения ингредиентов внутри блока.
+
+        Количества ингредиентов рецептов запоминаются до блока, а разница
+        с количествами после него применяется к спискам всех, у кого
+        рецепт в корзине. Так списки покупок следят за правкой
+        ингредиентов в админке.
+        """
+        recipe_ids = {pk for pk in recipe_ids if pk is not None}
+        before = self.amounts_by_recipe(recipe_ids)
+        yield
+        after = self.amounts_by_recipe(recipe_ids)
+        for recipe in recipe_ids:
+            self.apply_deltas(
+                ShoppingCart.objects.filter(
+                    recipe=recipe
+                ).values_list('user', flat=True),
+                {
+                    ingredient: after[recipe].get(ingredient, 0)
+                    - before[recipe].get(ingredient, 0)
+                    for ingredient in before[recipe].keys() | after[recipe]
+                },
+            )
+
+    def add_recipes(self, user_ids, recipe_ids):
+        self.apply_deltas(user_ids, self.recipe_amounts(recipe_ids))
+
+    def remove_recipes(self, user_ids, recipe_ids):
+        self.apply_deltas(user_ids, {
+            ingredient: -amount
+            for ingredient, amount in self.recipe_amounts(recipe_ids).items()
+        })
+
+
+class ShoppingListItem(models.Model):
+    """Класс модели суммарного списка покупок пользователя"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        ordering = ('id', )
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_shopping_list'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'{self.ingredient} в списке покупок пользователя {self.user}'
+        )
@@ -0,0 +1,108 @@
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+from .models import IngredientAmount, Recipe
+
+SIMILAR_TOP_K = 10
+SIMILAR_MAX_DF = 0.1
+SIMILAR_CHUNK_SIZE = 1000
+METRICS = ('jaccard', 'cosine')
+
+
+def fetch_pairs(queryset, *fields):
+    return np.fromiter(
+        chain.from_iterable(
+            queryset.order_by().values_list(*fields).iterator(
+                chunk_size=10000
+            )
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+
+class RecipeMatrix:
+    """Разреженная бинарная матрица рецепт x признак.
+
+    Признаки - ингредиенты и теги рецепта. Признаки, которые встречаются
+    больше чем в max_df доле рецептов (соль, вода), отбрасываются: они не
+    отличают рецепты друг от друга, но делают произведение матриц почти
+    плотным.
+    """
+
+    def __init__(self, max_df=SIMILAR_MAX_DF):
+        ingredients = fetch_pairs(
+            IngredientAmount.objects.all(), 'recipe', 'ingredient'
+        )
+        tags = fetch_pairs(Recipe.tags.through.objects.all(), 'recipe', 'tag')
+        offset = int(ingredients[:, 1].max()) + 1 if len(ingredients) else 0
+        tags[:, 1] += offset
+        pairs = np.concatenate((ingredients, tags))
+        self.recipe_ids = np.unique(pairs[:, 0])
+        rows = np.searchsorted(self.recipe_ids, pairs[:, 0])
+        columns = pairs[:, 1]
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+            shape=(
+                len(self.recipe_ids),
+                int(columns.max()) + 1 if len(columns) else 0,
+            ),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        keep = frequency <= max(1, max_df * len(self.recipe_ids))
+        self.matrix = matrix @ sparse.diags(keep.astype(np.float32))
+        self.matrix.eliminate_zeros()
+        self.sizes = np.diff(self.matrix.indptr).astype(np.float32)
+        self.transposed = self.matrix.T.tocsr()
+
+    def positions(self, recipe_ids):
+        """Переводит id рецептов в номера строк, пропуская неизвестные."""
+        recipe_ids = np.asarray(sorted(recipe_ids), dtype=np.int64)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        inside = positions < len(self.recipe_ids)
+        positions = positions[inside]
+        return positions[self.recipe_ids[positions] == recipe_ids[inside]]
+
+    def scores(self, positions, metric):
+        """Сходство строк positions со всеми рецептами, без самих себя."""
+        product = (self.matrix[positions] @ self.transposed).tocsr()
+        rows = np.repeat(positions, np.diff(product.indptr))
+        columns = product.indices
+        common = product.data
+        if metric == 'cosine':
+            product.data = common / np.sqrt(
+                self.sizes[rows] * self.sizes[columns]
+            )
+        else:
+            product.data = common / (
+                self.sizes[rows] + self.sizes[columns] - common
+            )
+        product.data[rows == columns] = 0
+        product.eliminate_zeros()
+        return product
+
+    def top_k(self, positions, k=SIMILAR_TOP_K, metric='jaccard'):
+        """Возвращает {id рецепта: [(id похожего, сходство), ...]}.
+
+        Строки считаются пачками по SIMILAR_CHUNK_SIZE; при равном
+        сходстве выше стоит более новый рецепт.
+        """
+        result = {}
+        for start in range(0, len(positions), SIMILAR_CHUNK_SIZE):
+            chunk = positions[start:start + SIMILAR_CHUNK_SIZE]
+            scores = self.scores(chunk, metric)
+            for row, position in enumerate(chunk):
+                begin, end = scores.indptr[row], scores.indptr[row + 1]
+                similar = self.recipe_ids[scores.indices[begin:end]]
+                values = scores.data[begin:end]
+                if len(values) > k:
+                    best = np.argpartition(-values, k - 1)[:k]
+                    similar, values = similar[best], values[best]
+                order = np.lexsort((-similar, -values))
+                result[int(self.recipe_ids[position])] = list(zip(
+                    similar[order].tolist(), values[order].tolist()
+                ))
+        return result
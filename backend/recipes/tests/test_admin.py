@@ -0,0 +1,106 @@
+import pytest
+from recipes.management.commands.rebuild_shopping_lists import \
+    Command as ShoppingLists
+from recipes.models import IngredientAmount, ShoppingCart
+
+
+@pytest.fixture
+def admin_user_client(client, make_user):
+    admin = make_user('admin')
+    admin.is_staff = admin.is_superuser = True
+    admin.save()
+    client.force_login(admin)
+    return client
+
+
+@pytest.fixture
+def carts(make_user, make_recipes):
+    recipes = make_recipes(2)
+    for index in range(3):
+        ShoppingCart.objects.link(
+            make_user(f'buyer-{index}'), [recipe.id for recipe in recipes]
+        )
+    return recipes
+
+
+def assert_shopping_lists_consistent():
+    assert ShoppingLists.stored_totals() == ShoppingLists.expected_totals()
+
+
+@pytest.mark.django_db
+def test_recipe_inline_edit_updates_shopping_lists(
+    admin_user_client, carts, ingredients
+):
+    recipe = carts[0]
+    items = list(recipe.recipe_ingredient.all())
+    data = {
+        'name': recipe.name,
+        'author': recipe.author_id,
+        'tags': [tag.id for tag in recipe.tags.all()],
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'recipe_ingredient-TOTAL_FORMS': len(items) + 1,
+        'recipe_ingredient-INITIAL_FORMS': len(items),
+        'recipe_ingredient-MIN_NUM_FORMS': 0,
+        'recipe_ingredient-MAX_NUM_FORMS': 1000,
+    }
+    for index, item in enumerate(items):
+        prefix = f'recipe_ingredient-{index}'
+        data.update({
+            f'{prefix}-id': item.id,
+            f'{prefix}-recipe': recipe.id,
+            f'{prefix}-ingredient': item.ingredient_id,
+            f'{prefix}-amount': item.amount + index,
+        })
+    data['recipe_ingredient-0-DELETE'] = 'on'
+    data.update({
+        f'recipe_ingredient-{len(items)}-recipe': recipe.id,
+        f'recipe_ingredient-{len(items)}-ingredient': ingredients[-1].id,
+        f'recipe_ingredient-{len(items)}-amount': 7,
+    })
+    response = admin_user_client.post(
+        f'/admin/recipes/recipe/{recipe.id}/change/', data
+    )
+    assert response.status_code == 302
+    assert recipe.recipe_ingredient.count() == len(items)
+    assert_shopping_lists_consistent()
+
+
+@pytest.mark.django_db
+def test_ingredient_amount_admin_updates_shopping_lists(
+    admin_user_client, carts
+):
+    item = carts[0].recipe_ingredient.first()
+    response = admin_user_client.post(
+        f'/admin/recipes/ingredientamount/{item.id}/change/',
+        {'recipe': carts[1].id, 'ingredient': item.ingredient_id,
+         'amount': 40},
+    )
+    assert response.status_code == 302
+    assert_shopping_lists_consistent()
+    response = admin_user_client.post(
+        '/admin/recipes/ingredientamount/',
+        {'action': 'delete_selected', 'post': 'yes',
+         '_selected_action': list(IngredientAmount.objects.filter(
+             recipe=carts[1]
+         ).values_list('id', flat=True)[:3])},
+    )
+    assert response.status_code == 302
+    assert_shopping_lists_consistent()
+
+
+@pytest.mark.django_db
+def test_recipe_and_cart_admin_delete_updates_shopping_lists(
+    admin_user_client, carts
+):
+    cart = ShoppingCart.objects.filter(recipe=carts[1]).first()
+    response = admin_user_client.post(
+        f'/admin/recipes/shoppingcart/{cart.id}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert_shopping_lists_consistent()
+    response = admin_user_client.post(
+        f'/admin/recipes/recipe/{carts[0].id}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert_shopping_lists_consistent()
@@ -0,0 +1,36 @@
+import pytest
+from recipes.feed import fan_out
+from recipes.models import FeedItem
+from users.models import Subscribe
+
+
+@pytest.fixture
+def followers(make_user, author):
+    users = [make_user(f'follower-{index}') for index in range(3)]
+    for user in users:
+        Subscribe.objects.link(user, [author.id])
+    return users
+
+
+@pytest.mark.django_db
+def test_fan_out_writes_feeds_with_one_read(
+    followers, make_recipes, django_assert_num_queries
+):
+    recipe, = make_recipes(1)
+    with django_assert_num_queries(2):
+        assert fan_out(recipe) == len(followers)
+    assert set(FeedItem.objects.values_list('user', flat=True)) == {
+        user.id for user in followers
+    }
+
+
+@pytest.mark.django_db
+def test_fan_out_over_limit_marks_recipe_for_read(
+    followers, make_recipes, settings
+):
+    settings.FEED_FANOUT_LIMIT = len(followers) - 1
+    recipe, = make_recipes(1)
+    assert fan_out(recipe) == 0
+    recipe.refresh_from_db()
+    assert recipe.feed_on_read
+    assert not FeedItem.objects.exists()
@@ -0,0 +1,61 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from recipes.models import IngredientAmount, Recipe
+
+
+def build_similar_recipes():
+    call_command('build_similar_recipes', max_df=1.0, stdout=StringIO())
+
+
+def similar_ids(client, recipe, query=''):
+    response = client.get(f'/api/recipes/{recipe.id}/similar/{query}')
+    assert response.status_code == 200
+    return [item['id'] for item in response.data]
+
+
+@pytest.fixture
+def recipes(make_recipes):
+    recipes = make_recipes(4)
+    build_similar_recipes()
+    return recipes
+
+
+@pytest.mark.django_db
+def test_similar_recipes_by_shared_ingredients(api_client, recipes):
+    first, second, third, fourth = recipes
+    assert similar_ids(api_client, first) == [second.id, third.id, fourth.id]
+    assert similar_ids(api_client, first, '?limit=2') == [second.id, third.id]
+    assert similar_ids(api_client, first, '?limit=0') == [second.id]
+    assert not Recipe.objects.filter(similar_stale=True).exists()
+
+
+@pytest.mark.django_db
+def test_similar_recipes_empty_and_missing(api_client, recipes, make_recipes):
+    lonely, = make_recipes(1)
+    lonely.recipe_ingredient.all().delete()
+    lonely.tags.clear()
+    build_similar_recipes()
+    assert similar_ids(api_client, lonely) == []
+    assert api_client.get('/api/recipes/0/similar/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_changed_recipe_is_rebuilt_incrementally(
+    api_client, recipes, ingredients
+):
+    first, second, third, fourth = recipes
+    fourth.recipe_ingredient.all().delete()
+    IngredientAmount.objects.bulk_create([
+        IngredientAmount(recipe=fourth, ingredient=ingredient, amount=1)
+        for ingredient in ingredients[:10]
+    ])
+    fourth.save()
+    assert list(Recipe.objects.filter(
+        similar_stale=True
+    ).values_list('id', flat=True)) == [fourth.id]
+    build_similar_recipes()
+    assert similar_ids(api_client, first) == [fourth.id, second.id, third.id]
+    assert similar_ids(api_client, fourth) == [first.id, second.id, third.id]
+    assert not Recipe.objects.filter(similar_stale=True).exists()
@@ -14,11 +14,14 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'email',
+        'recipes_count',
+        'subscribers_count',
     )
     search_fields = (
         'email',
         'username'
     )
+    show_full_result_count = False
     empty_value_display = 'пусто'
 
 
@@ -28,4 +31,7 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author'
     )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
     empty_value_display = 'пусто'
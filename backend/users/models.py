@@ -1,12 +1,14 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.db.models import (CASCADE, CharField, EmailField, ForeignKey,
-                              Model, UniqueConstraint)
+                              Model, PositiveIntegerField, UniqueConstraint)
+from foodgram.relations import (CounterFieldsMixin, RelationManager,
+                                RelationMixin)
 
 User = get_user_model
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """Класс кастомного пользователя"""
 
     email = EmailField(
@@ -25,6 +27,18 @@ class User(AbstractUser):
         help_text='Введите свою фамилию',
         max_length=150,
     )
+    recipes_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
+    subscribers_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     USERNAME_FIELD = 'email'
 
@@ -43,7 +57,7 @@ class User(AbstractUser):
         return self.username
 
 
-class Subscribe(Model):
+class Subscribe(RelationMixin, Model):
     """Класс модели подписок"""
 
     user = ForeignKey(
@@ -60,6 +74,10 @@ class Subscribe(Model):
         help_text='Выберите автора контента',
     )
 
+    objects = RelationManager()
+
+    counter_field = 'subscribers_count'
+
     class Meta:
         verbose_name = 'Подписчика'
         verbose_name_plural = 'Подписки'
@@ -1,14 +1,26 @@
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from recipes.models import Recipe
-from rest_framework.serializers import (ModelSerializer, ReadOnlyField,
-                                        SerializerMethodField)
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ModelSerializer, ReadOnlyField,
+                                        Serializer, SerializerMethodField)
 
 from .models import Subscribe
 
+BULK_RELATIONS_LIMIT = 100
+
+
+class RelationIdsSerializer(Serializer):
+    """Список id для массового добавления в избранное, корзину, подписки"""
+
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RELATIONS_LIMIT,
+    )
+
 
 class ShortRecipeSerializer(ModelSerializer):
-    image = Base64ImageField()
+    image = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -19,6 +31,15 @@ class ShortRecipeSerializer(ModelSerializer):
             'cooking_time',
         )
 
+    def get_image(self, obj):
+        image = obj.thumbnail or obj.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(image.url)
+        return image.url
+
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = SerializerMethodField()
@@ -34,6 +55,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -48,7 +71,7 @@ class SubscribeSerializer(ModelSerializer):
     email = ReadOnlyField(source='author.email')
     is_subscribed = SerializerMethodField()
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
+    recipes_count = ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = Subscribe
@@ -64,18 +87,18 @@ class SubscribeSerializer(ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return Subscribe.objects.filter(
-            user=self.context.get('request').user,
-            author=obj.author
-        ).exists()
+        return obj.user_id == self.context.get('request').user.id
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = obj.author.recipes.all()
-        if limit:
-            queryset = queryset[: int(limit)]
-        return ShortRecipeSerializer(queryset, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
+        recipes = self.context.get('recipes')
+        if recipes is not None:
+            queryset = recipes.get(obj.author_id, [])
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            queryset = obj.author.recipes.all()
+            if limit:
+                queryset = queryset[: int(limit)]
+        return ShortRecipeSerializer(
+            queryset, many=True, context=self.context
+        ).data
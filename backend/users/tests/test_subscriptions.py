@@ -0,0 +1,64 @@
+import pytest
+from recipes.models import Recipe
+from users.models import Subscribe
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query', ['', '?recipes_limit=2'])
+def test_subscriptions_without_subscriptions(api_client, query):
+    response = api_client.get(f'/api/users/subscriptions/{query}')
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
+@pytest.mark.django_db
+def test_subscriptions_page_past_the_end(api_client, user, author):
+    Subscribe.objects.link(user, [author.id])
+    response = api_client.get(
+        '/api/users/subscriptions/?recipes_limit=2&page=2&limit=1'
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_limit_per_author_on_empty_queryset():
+    assert list(
+        Recipe.objects.filter(author__in=[]).limit_per_author(2)
+    ) == []
+
+
+@pytest.mark.django_db
+def test_subscriptions_recipes_limit(api_client, user, author, make_recipes):
+    make_recipes(4)
+    Subscribe.objects.link(user, [author.id])
+    response = api_client.get('/api/users/subscriptions/?recipes_limit=2')
+    assert response.status_code == 200
+    [subscription] = response.data['results']
+    assert len(subscription['recipes']) == 2
+    assert subscription['recipes_count'] == 4
+
+
+def recipe_images(subscriptions):
+    return [
+        recipe['image']
+        for subscription in subscriptions
+        for recipe in subscription['recipes']
+    ]
+
+
+@pytest.mark.django_db
+def test_subscription_recipes_have_absolute_image_urls(
+    api_client, author, make_recipes
+):
+    make_recipes(1)
+    expected = ['http://testserver/media/recipe_img/test.png']
+    response = api_client.post(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 201
+    assert recipe_images([response.data]) == expected
+    response = api_client.get('/api/users/subscriptions/')
+    assert recipe_images(response.data['results']) == expected
+    response = api_client.post(
+        '/api/users/subscribe/', {'ids': [author.id]}, format='json'
+    )
+    assert response.status_code == 201
+    assert recipe_images(response.data) == expected
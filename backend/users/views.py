@@ -1,6 +1,9 @@
-from api.paginations import PagePaginationLimit
+from api.paginations import KeysetPaginationLimit
 from django.contrib.auth import get_user_model
+from django.db.transaction import atomic
 from djoser.views import UserViewSet
+from recipes.feed import follow, unfollow
+from recipes.models import Recipe
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
@@ -9,68 +12,117 @@ from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 
 from .models import Subscribe
-from .serializers import SubscribeSerializer
+from .serializers import RelationIdsSerializer, SubscribeSerializer
 
 User = get_user_model()
 
 
 class CustomUserViewSet(UserViewSet):
-    pagination_class = PagePaginationLimit
+    pagination_class = KeysetPaginationLimit
+    lookup_value_regex = r'\d+'
 
     @action(
         detail=False,
         methods=['GET'],
     )
     def subscriptions(self, request):
-        queryset = request.user.subscribers.all()
+        queryset = request.user.subscribers.select_related(
+            'author'
+        ).order_by(*Subscribe._meta.ordering)
         pages = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             pages,
             many=True,
-            context={'request': request}
+            context={
+                'request': request,
+                'recipes': self.get_authors_recipes(request, pages),
+            }
         )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def get_authors_recipes(request, subscriptions):
+        authors = [item.author_id for item in subscriptions]
+        if not authors:
+            return {}
+        queryset = Recipe.objects.filter(author__in=authors)
+        limit = request.GET.get('recipes_limit')
+        if limit:
+            queryset = queryset.limit_per_author(int(limit))
+        recipes = {}
+        for recipe in queryset:
+            recipes.setdefault(recipe.author_id, []).append(recipe)
+        return recipes
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
         permission_classes=(IsAuthenticated, )
     )
+    @atomic
     def subscribe(self, request, id=None):
         user = self.request.user
-        author = get_object_or_404(User, id=id)
         if self.request.method == 'POST':
+            author = get_object_or_404(User, id=id)
             if user == author:
                 raise ValidationError(
                     'Подписка на самого себя запрещена.'
                 )
-            if Subscribe.objects.filter(
-                user=user,
-                author=author
-            ).exists():
+            if not Subscribe.objects.link(user, [author.pk]):
                 raise ValidationError('Подписка уже оформлена.')
-            queryset = Subscribe.objects.create(
-                user=user,
-                author=author
-            )
+            follow(user, [author.pk])
             serializer = SubscribeSerializer(
-                queryset,
+                Subscribe(user=user, author=author),
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if user == author:
+        if user.id == int(id):
             raise ValidationError(
                 'Подписка не была оформлена, либо уже удалена.'
             )
-        subscribe = Subscribe.objects.filter(
-            user=user,
-            author=author
-        )
-        if subscribe.exists():
-            subscribe.delete()
+        if Subscribe.objects.unlink(user, [int(id)]):
+            unfollow(user, [int(id)])
             return Response(
                 {'successfully': 'Вы успешно отписались.'},
                 status=status.HTTP_204_NO_CONTENT
             )
+        get_object_or_404(User, id=id)
         return Response({'errors': 'Вы уже отписаны.'},
                         status=status.HTTP_400_BAD_REQUEST)
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        url_path='subscribe',
+        permission_classes=(IsAuthenticated, )
+    )
+    @atomic
+    def subscribe_bulk(self, request):
+        user = request.user
+        serializer = RelationIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        if request.method == 'DELETE':
+            unfollow(user, Subscribe.objects.unlink(user, ids))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if user.id in ids:
+            raise ValidationError('Подписка на самого себя запрещена.')
+        authors = User.objects.in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in authors]
+        if missing:
+            raise ValidationError(
+                {'ids': f'Пользователи не найдены: {", ".join(missing)}.'}
+            )
+        follow(user, Subscribe.objects.link(user, ids))
+        subscriptions = [
+            Subscribe(user=user, author=authors[pk]) for pk in ids
+        ]
+        serializer = SubscribeSerializer(
+            subscriptions,
+            many=True,
+            context={
+                'request': request,
+                'recipes': self.get_authors_recipes(request, subscriptions),
+            }
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)